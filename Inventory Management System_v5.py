@@ -1,15 +1,24 @@
+import time
+STARTUP_STARTED = time.perf_counter()  # The cold-start budget is measured from here.
 import tkinter as tk
-from PIL import Image, ImageTk
 import tkinter.font as tkfont
-from tkinter import messagebox, ttk, filedialog
+from tkinter import messagebox, ttk, filedialog, simpledialog
 import sqlite3
-import openpyxl
-import time
-from openpyxl.styles import Font
-from datetime import datetime
+from datetime import datetime, timedelta
+from collections import deque
 import sys
 import os
-from threading import Timer, Thread
+import queue
+import logging
+from inventory_db import Database
+from inventory_core import EditConflictError, ItemNotFoundError, ValidationError, format_changes
+from inventory_import import read_rows, write_rejects
+from inventory_metrics import QueryProfiler
+from inventory_schema import SCHEMA_VERSION
+from inventory_store import (ANCHOR_STRIDE, AUDIT_PAGE_SIZE, AUDIT_RETENTION_DAYS, DASHBOARD_DAYS, InventoryStore,
+                             archive_path)
+
+log = logging.getLogger(__name__)
 
 # Modern UI Colors
 COLORS = {
@@ -28,80 +37,143 @@ COLORS = {
 }
 
 # --- Database Connection Management ---
-def get_db_connection(max_retries=3):
-    db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'inventory.db')
-    print(f"Attempting to connect to database at: {db_path}")  # Debug info
+def get_db_path():
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'inventory.db')
+
+def open_database(max_retries=3):
+    db_path = get_db_path()
+    log.info("Connecting to database at %s", db_path)
 
     for attempt in range(max_retries):
         try:
-            connection = sqlite3.connect(db_path)
+            database = Database(db_path, profiler=profiler, attach={"archive": archive_path(db_path)})
             # Test the connection
-            cursor = connection.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='inventory'")
-            if not cursor.fetchone():
-                # Table doesn't exist, create it
-                cursor.execute('''
-                CREATE TABLE IF NOT EXISTS inventory (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    item_name TEXT NOT NULL CHECK(length(item_name) <= 100),
-                    quantity INTEGER NOT NULL CHECK(quantity >= 0),
-                    price REAL NOT NULL CHECK(price >= 0),
-                    updated_by TEXT NOT NULL CHECK(length(updated_by) <= 50),
-                    low_stock_threshold INTEGER DEFAULT 10 CHECK(low_stock_threshold >= 0)
-                )
-                ''')
-                connection.commit()
-            return connection
+            database.query_one("SELECT 1")
+            return database
         except sqlite3.Error as e:
             if attempt == max_retries - 1:  # Last attempt
                 messagebox.showerror("Database Error", f"Failed to connect to database after {max_retries} attempts: {e}\nPath: {db_path}")
                 raise
             time.sleep(1)  # Wait before retrying
 
-def safe_commit(connection):
-    try:
-        connection.commit()
-    except sqlite3.Error as e:
-        connection.rollback()
-        raise sqlite3.Error(f"Failed to commit transaction: {e}")
+def initialize_database(on_ready):
+    """Migrate the schema on a store worker, keeping the window painted and input blocked until it is done."""
+    def ready(applied):
+        status_bar.grab_release()
+        root.config(cursor="")
+        if applied:
+            log.info("Database schema migrated to version %s", SCHEMA_VERSION)
+        on_ready()
+
+    def failed(error):
+        status_bar.grab_release()
+        messagebox.showerror("Database Error", f"Failed to initialize database: {error}")
+        store.close()
+        root.destroy()
 
-def initialize_database():
+    update_status("Checking the database schema...")
+    root.config(cursor="watch")
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-
-        # Create tables if they don't exist
-        c.execute('''
-        CREATE TABLE IF NOT EXISTS inventory (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            item_name TEXT NOT NULL CHECK(length(item_name) <= 100),
-            quantity INTEGER NOT NULL CHECK(quantity >= 0),
-            price REAL NOT NULL CHECK(price >= 0),
-            updated_by TEXT NOT NULL CHECK(length(updated_by) <= 50),
-            low_stock_threshold INTEGER DEFAULT 10 CHECK(low_stock_threshold >= 0)
-        )
-        ''')
-
-        c.execute('''
-        CREATE TABLE IF NOT EXISTS audit_log (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            action TEXT NOT NULL,
-            item_id INTEGER,
-            item_name TEXT,
-            user TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-
-        # Create indexes if they don't exist
-        c.execute("CREATE INDEX IF NOT EXISTS idx_item_name ON inventory(item_name)")
-        c.execute("CREATE INDEX IF NOT EXISTS idx_quantity ON inventory(quantity)")
-        c.execute("CREATE INDEX IF NOT EXISTS idx_price ON inventory(price)")
-
-        conn.commit()
-    except sqlite3.Error as e:
-        messagebox.showerror("Database Error", f"Failed to initialize database: {e}")
-        exit(1)
+        status_bar.grab_set()  # Clicks and keys go nowhere until the schema is current.
+    except tk.TclError:
+        pass  # Not viewable yet (e.g. started minimized); nothing to click either.
+    query_runner.submit(None, store.submit(store.initialize), ready, failed)
+
+def run_audit_retention():
+    """Archive audit entries older than AUDIT_RETENTION_DAYS in the background, at most once a day."""
+    def archive():
+        return store.archive_audit() if store.retention_due() else 0
+
+    def done(moved):
+        if moved:
+            update_status(f"Archived {moved:,} audit entries older than {AUDIT_RETENTION_DAYS} days.")
+
+    query_runner.submit(None, store.submit(archive), done, lambda e: log.warning("Audit archiving failed: %s", e))
+
+def run_inventory_snapshot():
+    """Take the periodic inventory snapshot behind as-of reports when one is due, then check again later."""
+    def snapshot():
+        return store.take_snapshot() if store.snapshot_due() else None
+
+    def done(taken):
+        if taken:
+            log.info("Inventory snapshot %s: %s items (%s)", taken[0], f"{taken[2]:,}",
+                     "full" if taken[1] else "changes only")
+
+    query_runner.submit(None, store.submit(snapshot), done, lambda e: log.warning("Inventory snapshot failed: %s", e))
+    root.after(SNAPSHOT_CHECK_MS, run_inventory_snapshot)
+
+# --- Async Query Execution ---
+ASYNC_QUERIES = True
+
+class AsyncQueryRunner:
+    """Hands database futures back to the Tk main loop.
+
+    Completed futures are queued by the worker threads and drained with
+    ``after``, so callbacks always run on the UI thread. Submitting on a
+    channel supersedes the previous request on it: that future is cancelled
+    if it has not started, and its result is dropped if it has. With
+    ``enabled=False`` the runner waits for each future inline instead.
+    Workers report progress with ``post``, which goes through the same drain.
+    """
+    POLL_MS = 15
+
+    def __init__(self, widget, enabled=True):
+        self.widget = widget
+        self.enabled = enabled
+        self.completed = queue.Queue()
+        self.updates = queue.Queue()
+        self.latest = {}
+        self.widget.after(self.POLL_MS, self._poll)
+
+    def submit(self, channel, future, on_result, on_error=None):
+        if channel is not None:
+            self.cancel(channel)
+            self.latest[channel] = future
+        if not self.enabled:
+            self._deliver(channel, future, on_result, on_error)
+            return
+        future.add_done_callback(lambda f: self.completed.put((channel, f, on_result, on_error)))
+
+    def post(self, func, *args):
+        """Call ``func(*args)`` on the UI thread; safe from any thread (e.g. a progress callback)."""
+        self.updates.put((func, args))
+
+    def cancel(self, channel):
+        previous = self.latest.pop(channel, None)
+        if previous is not None:
+            previous.cancel()
+
+    def _deliver(self, channel, future, on_result, on_error):
+        if channel is not None:
+            if self.latest.get(channel) is not future:
+                return  # Superseded by a newer request.
+            del self.latest[channel]
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            if on_error is not None:
+                on_error(error)
+            else:
+                messagebox.showerror("Database Error", str(error))
+        else:
+            on_result(future.result())
+
+    def _poll(self):
+        self.widget.after(self.POLL_MS, self._poll)
+        while True:
+            try:
+                func, args = self.updates.get_nowait()
+            except queue.Empty:
+                break
+            func(*args)
+        while True:
+            try:
+                task = self.completed.get_nowait()
+            except queue.Empty:
+                break
+            self._deliver(*task)
 
 # --- GUI Setup and Functions ---
 def center_window(window, width, height):
@@ -167,8 +239,9 @@ def update_status(message):
         status_var.set(message)
 
 def clear_inputs():
-    global selected_item_id
+    global selected_item_id, selected_item_version
     selected_item_id = None
+    selected_item_version = None
     entry_widgets["Item Name"].delete(0, tk.END)
     entry_widgets["Quantity"].delete(0, tk.END)
     entry_widgets["Price"].delete(0, tk.END)
@@ -176,271 +249,1245 @@ def clear_inputs():
     add_button.config(text="Add Item", bg=COLORS['primary'])
     update_status("Ready to add new item.")
 
-def display_inventory(filter_text="", page=1, page_size=50):
-    try:
-        # Clear existing items
-        for row in inventory_tree.get_children():
-            inventory_tree.delete(row)
+# --- Virtual Inventory View ---
+INVENTORY_FIELDS = ("id", "item_name", "quantity", "price", "updated_by")
+# Treeview heading -> indexed sort column
+SORT_COLUMNS = dict(zip(("ID", "Item Name", "Quantity", "Price", "Updated By"), INVENTORY_FIELDS))
+
+def format_inventory_row(row):
+    return (row[0], row[1], row[2], f"${row[3]:.2f}", row[4] if row[4] else 'N/A')
+
+class VirtualInventoryView:
+    """Virtual-scrolling controller for ``inventory_tree``.
+
+    The Treeview only ever holds the rows that fit on screen. Rows come from a
+    bounded buffer (the visible window plus a prefetch margin on each side)
+    that is refilled with keyset seeks on the sort key (``WHERE id > ?`` or
+    ``WHERE (quantity, id) > (?, ?)``), so scrolling costs the same at row
+    200,000 as at row 1. Scrollbar jumps seek from the nearest anchor key,
+    recorded every ``ANCHOR_STRIDE`` rows. Sorting is an ``ORDER BY`` on an
+    indexed column, so it always covers the whole table. Fetches run on the
+    database read pool and are applied on the Tk thread.
+    """
+    PREFETCH = 100
+    MAX_BUFFER = 500
+    ROW_HEIGHT = 32
+
+    def __init__(self, tree, scrollbar):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.filter_text = ""
+        self.ranked = False
+        self.low_stock_only = False
+        self.sort_column = "id"
+        self.sort_descending = False
+        self.total = 0
+        self.top = 0
+        self.visible = 20
+        self.header_height = self.ROW_HEIGHT
+        self.buffer = []
+        self.buffer_start = 0
+        self.anchors = None
+        self.reloading = False
+        self.reload_done = None
+        self.generation = 0
+        self.ranked_results = False
+        self.rendered = {}
+        self.selected = set()  # Selected item ids, including rows scrolled out of the window.
+
+        scrollbar.configure(command=self.yview)
+        tree.bind('<Configure>', self.on_resize)
+        tree.bind('<MouseWheel>', self.on_mousewheel)
+        tree.bind('<Button-4>', lambda e: self.scroll(-3))
+        tree.bind('<Button-5>', lambda e: self.scroll(3))
+        tree.bind('<Prior>', lambda e: self.scroll(-self.visible))
+        tree.bind('<Next>', lambda e: self.scroll(self.visible))
+        tree.bind('<Up>', lambda e: self.on_arrow(-1))
+        tree.bind('<Down>', lambda e: self.on_arrow(1))
+        tree.bind('<Button-1>', self.on_click)
+
+    def _filter(self):
+        return {"text": self.filter_text, "low_stock_only": self.low_stock_only}
+
+    def _view(self):
+        return dict(self._filter(), sort=self.sort_column, descending=self.sort_descending)
+
+    def _key_columns(self):
+        return store.view_key_columns(self.sort_column)
+
+    def _sort_key(self, row):
+        return tuple(row[INVENTORY_FIELDS.index(col)] for col in self._key_columns())
+
+    def _query(self, connection, key=None, backward=False, inclusive=False, limit=None):
+        return store.page(key=key, backward=backward, inclusive=inclusive, limit=limit, connection=connection,
+                          **self._view())
+
+    def _fetch(self, connection, start, total, buffer, buffer_start, anchors):
+        """Return a new ``(buffer, buffer_start, anchors)`` covering rows [start, start + visible).
+
+        Runs on a database worker thread, so it never mutates the view.
+        """
+        end = min(start + self.visible, total)
+        buffer_end = buffer_start + len(buffer)
+
+        if buffer and buffer_start <= start <= buffer_end + self.PREFETCH:
+            # Scrolled just past the end: seek forward from the last key.
+            rows = self._query(connection, self._sort_key(buffer[-1]), limit=end - buffer_end + self.PREFETCH)
+            buffer = buffer + rows
+        elif buffer and start < buffer_start <= end + self.PREFETCH:
+            # Scrolled just before the start: seek backward from the first key.
+            rows = self._query(connection, self._sort_key(buffer[0]), backward=True,
+                               limit=buffer_start - start + self.PREFETCH)
+            buffer = rows + buffer
+            buffer_start = max(0, buffer_start - len(rows))
+        else:
+            # Jump: start from the nearest anchor at or before the window.
+            first = max(0, start - self.PREFETCH)
+            limit = self.visible + 2 * self.PREFETCH
+            if first == 0:
+                rows = self._query(connection, limit=limit)
+            else:
+                if anchors is None:
+                    # One index-only pass; afterwards any scroll position is at
+                    # most ANCHOR_STRIDE rows away from a known key.
+                    anchors = store.anchors(connection=connection, **self._view())
+                index = min(first // ANCHOR_STRIDE, len(anchors) - 1)
+                skip = first - index * ANCHOR_STRIDE
+                rows = self._query(connection, anchors[index], inclusive=True, limit=skip + limit)[skip:]
+            return rows, first, anchors
+
+        if len(buffer) > self.MAX_BUFFER:
+            low = max(0, start - self.PREFETCH - buffer_start)
+            high = start + self.visible + self.PREFETCH - buffer_start
+            buffer = buffer[low:high]
+            buffer_start += low
+        return buffer, buffer_start, anchors
+
+    def _covers(self, start):
+        end = min(start + self.visible, self.total)
+        return end <= start or (self.buffer_start <= start and end <= self.buffer_start + len(self.buffer))
+
+    def _clamp(self, position, total):
+        return max(0, min(position, total - self.visible))
+
+    def reload(self, filter_text=None, ranked=None, low_stock=None, keep_position=False, on_done=None):
+        """Re-count and re-fetch the current window; ``on_done`` runs once it is shown or superseded."""
+        if self.reload_done is not None:
+            self.reload_done()  # The previous reload is superseded by this one.
+        self.reload_done = on_done
+        if (filter_text is not None and filter_text != self.filter_text) or (ranked is not None and ranked != self.ranked) \
+                or (low_stock is not None and low_stock != self.low_stock_only):
+            self.selected.clear()  # The selection only makes sense for the rows it was made from.
+        if filter_text is not None:
+            self.filter_text = filter_text
+        if ranked is not None:
+            self.ranked = ranked
+        if low_stock is not None:
+            self.low_stock_only = low_stock
+        self.generation += 1
+        top = self.top if keep_position else 0
+        ranked_mode = self.ranked and store.can_rank(self.filter_text)
+
+        def load(connection):
+            if ranked_mode:
+                # Best matches first; the whole (capped) result set fits in the buffer.
+                rows = store.ranked_rows(connection, self.filter_text, low_stock_only=self.low_stock_only)
+                return len(rows), 0, (rows, 0, None)
+            total = store.count_items(connection=connection, **self._filter())
+            position = self._clamp(top, total)
+            return total, position, self._fetch(connection, position, total, [], 0, None)
+
+        def finish():
+            self.reloading = False
+            done, self.reload_done = self.reload_done, None
+            if done is not None:
+                done()
+
+        def apply(result):
+            self.total, self.top, (self.buffer, self.buffer_start, self.anchors) = result
+            self.ranked_results = ranked_mode
+            finish()
+            self.scroll_to(self.top)
+
+        def failed(error):
+            finish()
+            messagebox.showerror("Database Error", f"Failed to load inventory: {error}")
+
+        self.reloading = True
+        query_runner.submit('inventory', db.submit_read(load), apply, failed)
+
+    def sort_by(self, column):
+        """Sort the whole table by a Treeview heading; clicking again reverses it."""
+        field = SORT_COLUMNS[column]
+        self.sort_descending = field == self.sort_column and not self.sort_descending
+        self.sort_column = field
+        for heading, heading_field in SORT_COLUMNS.items():
+            arrow = (" \u25bc" if self.sort_descending else " \u25b2") if heading_field == field else ""
+            self.tree.heading(heading, text=heading + arrow)
+        self.reload(ranked=False)
+
+    def scroll_to(self, position, then=None):
+        """Show the window starting at ``position``, fetching rows in the background if needed.
+
+        ``then`` runs once the window has been rendered.
+        """
+        if self.reloading:
+            return  # The pending reload replaces the buffer anyway.
+        position = self._clamp(position, self.total)
+
+        def show(result=None):
+            if result is not None:
+                self.buffer, self.buffer_start, self.anchors = result
+            self.top = position
+            self.render()
+            if then is not None:
+                then()
+
+        def failed(error):
+            messagebox.showerror("Database Error", f"Failed to load inventory: {error}")
+
+        if self._covers(position):
+            query_runner.cancel('inventory')  # Drop any fetch for an older position.
+            show()
+        else:
+            future = db.submit_read(self._fetch, position, self.total,
+                                    self.buffer, self.buffer_start, self.anchors)
+            query_runner.submit('inventory', future, show, failed)
+
+    def scroll(self, amount, then=None):
+        self.scroll_to(self.top + amount, then)
+        return "break"
+
+    # --- Incremental updates ---
+    def _precedes(self, key, other):
+        return key > other if self.sort_descending else key < other
+
+    def _index_of(self, item_id):
+        for index, row in enumerate(self.buffer):
+            if row[0] == item_id:
+                return index
+        return None
+
+    def _shift(self, position, delta):
+        # A row appeared (+1) or vanished (-1) at absolute ``position``; keep
+        # the rows on screen where they are.
+        self.total += delta
+        if position < self.top:
+            self.top += delta
+        self.anchors = None
+
+    def _insert(self, row):
+        key = self._sort_key(row)
+        buffer_end = self.buffer_start + len(self.buffer)
+        if not self.buffer:
+            if self.total:
+                return False
+            index = 0
+        elif self._precedes(key, self._sort_key(self.buffer[0])) and self.buffer_start > 0:
+            # Somewhere above the buffer: everything buffered moves down one.
+            self.buffer_start += 1
+            self._shift(self.buffer_start - 1, 1)
+            return True
+        elif self._precedes(self._sort_key(self.buffer[-1]), key):
+            if buffer_end < self.total:
+                self._shift(buffer_end, 1)  # Below the buffer.
+                return True
+            index = len(self.buffer)
+        else:
+            index = next(i for i, buffered in enumerate(self.buffer) if self._precedes(key, self._sort_key(buffered)))
+        self.buffer = self.buffer[:index] + [row] + self.buffer[index:]
+        self._shift(self.buffer_start + index, 1)
+        return True
 
-        # Calculate offset for pagination
-        offset = (page - 1) * page_size
+    def apply_change(self, item_id, row, existed):
+        """Patch the buffer after a write instead of reloading the table.
 
-        # Query with pagination
-        query = """
-        SELECT id, item_name, quantity, price, updated_by FROM inventory
+        ``row`` is the item as it now matches the view (None when it was
+        deleted or no longer matches the filter); ``existed`` says whether the
+        item was in the table before the write. Falls back to a reload only
+        when the item's old position is unknown.
         """
-        params = ()
-
-        if filter_text:
-            query += " WHERE item_name LIKE ?"
-            params = ('%' + filter_text + '%',)
+        if self.reloading:
+            return  # The pending reload already reads the new state.
+        query_runner.cancel('inventory')  # In-flight fetches were built from the old buffer.
+        index = self._index_of(item_id)
+
+        if self.ranked_results:
+            if index is None:
+                self.reload(keep_position=True)
+                return
+            if row is None:
+                self.buffer = self.buffer[:index] + self.buffer[index + 1:]
+                self._shift(index, -1)
+            else:
+                self.buffer = self.buffer[:index] + [row] + self.buffer[index + 1:]
+            self.scroll_to(self.top)
+            return
 
-        query += f" LIMIT {page_size} OFFSET {offset}"
+        if index is not None:
+            self.buffer = self.buffer[:index] + self.buffer[index + 1:]
+            self._shift(self.buffer_start + index, -1)
+        elif existed:
+            self.reload(keep_position=True)
+            return
+        if row is not None and not self._insert(row):
+            self.reload(keep_position=True)
+            return
+        self.scroll_to(self.top)
 
-        c.execute(query, params)
+    def refresh_item(self, item_id, existed=True):
+        """Re-read one item after a write and patch it into the view."""
+        generation = self.generation
 
-        # Insert items into tree
-        for row in c.fetchall():
-            inventory_tree.insert('', 'end', iid=row[0],
-                                values=(row[0], row[1], row[2], f"${row[3]:.2f}",
-                                       row[4] if row[4] else 'N/A'))
+        def patch(row):
+            if generation == self.generation:
+                self.apply_change(item_id, row, existed)
 
-    except sqlite3.Error as e:
-        messagebox.showerror("Database Error", f"Failed to load inventory: {e}")
+        query_runner.submit(None, store.submit(store.view_item, item_id, **self._filter()), patch)
 
-def load_selected_item(event):
-    global selected_item_id
-    selected = inventory_tree.selection()
-    if selected:
-        selected_item_id = int(selected[0])
-        try:
-            c.execute("SELECT id, item_name, quantity, price, updated_by FROM inventory WHERE id=?", (selected_item_id,))
-            row = c.fetchone()
-            if row:
-                entry_widgets["Item Name"].delete(0, tk.END)
-                entry_widgets["Item Name"].insert(0, row[1])
-                entry_widgets["Quantity"].delete(0, tk.END)
-                entry_widgets["Quantity"].insert(0, row[2])
-                entry_widgets["Price"].delete(0, tk.END)
-                entry_widgets["Price"].insert(0, row[3])
-                entry_widgets["Updated By"].delete(0, tk.END)
-                entry_widgets["Updated By"].insert(0, row[4] if row[4] else '')
-                add_button.config(text="Update Item", bg=COLORS['accent'])
-                update_status(f"Loaded item ID {selected_item_id} for editing.")
-        except sqlite3.Error as e:
-            messagebox.showerror("Database Error", f"Failed to load item: {e}")
-    else:
-        clear_inputs()
+    def refresh_items(self, item_ids, changed_fields):
+        """Patch many items after a batch update with one query.
 
-def is_duplicate_name(name, exclude_id=None):
-    try:
-        if exclude_id is None:
-            c.execute("SELECT COUNT(*) FROM inventory WHERE LOWER(item_name) = LOWER(?)", (name,))
-        else:
-            c.execute("SELECT COUNT(*) FROM inventory WHERE LOWER(item_name) = LOWER(?) AND id != ?", (name, exclude_id))
-        count = c.fetchone()[0]
-        return count > 0
-    except sqlite3.Error as e:
-        messagebox.showerror("Database Error", f"Failed to check duplicate: {e}")
-        return False
+        Only buffered rows are re-read; the rest keep their positions. When
+        the update touched the sort column rows may have moved, so the
+        window is reloaded instead.
+        """
+        if self.reloading:
+            return
+        if self.sort_column in changed_fields and not self.ranked_results:
+            self.reload(keep_position=True)
+            return
+        if self.low_stock_only and {"quantity", "low_stock_threshold"} & set(changed_fields):
+            self.reload(keep_position=True)  # Items may have entered or left the low-stock filter.
+            return
+        changed = set(item_ids)
+        buffered = [row[0] for row in self.buffer if row[0] in changed]
+        if not buffered:
+            return
+        generation = self.generation
 
-def add_item():
-    global selected_item_id
-    name = entry_widgets["Item Name"].get().strip()
-    quantity = entry_widgets["Quantity"].get().strip()
-    price = entry_widgets["Price"].get().strip()
-    user = entry_widgets["Updated By"].get().strip()
-
-    if len(name) > 100:
-        update_status("Item name must be 100 characters or less!")
-        return
-    if len(user) > 50:
-        update_status("Updated By must be 50 characters or less!")
-        return
+        def patch(rows):
+            if generation != self.generation:
+                return
+            query_runner.cancel('inventory')  # In-flight fetches were built from the old buffer.
+            fresh = {row[0]: row for row in rows}
+            self.buffer = [fresh.get(row[0], row) for row in self.buffer]
+            self.scroll_to(self.top)
 
-    if not (name and quantity and price and user):
-        update_status("All fields are required!")
-        return
+        query_runner.submit(None, store.submit(store.items, buffered), patch)
 
-    name = ''.join(c for c in name if c.isprintable())
-    user = ''.join(c for c in user if c.isprintable())
+    def remove_items(self, rows):
+        """Drop deleted items from the view in one pass, given their rows as they were deleted.
 
-    try:
-        quantity_int = int(quantity)
-        price_float = float(price)
+        Rows outside the buffer are placed above or below it by their sort
+        key, so the window stays on the same items.
+        """
+        removed = {row[0] for row in rows}
+        self.selected -= removed
+        if self.reloading or not rows:
+            return  # A pending reload already reads the new state.
+        query_runner.cancel('inventory')
+        if not self._covers(self.top):
+            self.reload(keep_position=True)
+            return
+        before_top = sum(1 for row in self.buffer[:self.top - self.buffer_start] if row[0] in removed)
+        kept = [row for row in self.buffer if row[0] not in removed]
 
-        if quantity_int < 0 or price_float < 0:
-            update_status("Quantity and Price must be non-negative.")
+        if self.ranked_results:
+            self.total -= len(self.buffer) - len(kept)
+        else:
+            buffered = {row[0] for row in self.buffer}
+            above = 0
+            if self.buffer:
+                first_key = self._sort_key(self.buffer[0])
+                above = sum(1 for row in rows
+                            if row[0] not in buffered and self._precedes(self._sort_key(row), first_key))
+            self.buffer_start -= above
+            before_top += above
+            self.total -= len(removed)
+            self.anchors = None
+        self.buffer = kept
+        self.top -= before_top
+        self.scroll_to(self.top)
+
+    # --- Selection ---
+    def sync_selection(self):
+        """Fold the Treeview's selection of the rendered rows into ``selected``."""
+        selection = set(self.tree.selection())
+        for iid in self.rendered:
+            if iid in selection:
+                self.selected.add(int(iid))
+            else:
+                self.selected.discard(int(iid))
+
+    def clear_selection(self):
+        self.selected.clear()
+        self.tree.selection_remove(self.tree.selection())
+
+    def select_all(self, then=None):
+        """Select every item matching the current filter, including rows outside the window."""
+        def apply(item_ids):
+            self.selected = set(item_ids)
+            self.render()
+            if then is not None:
+                then()
+
+        if self.ranked_results:
+            apply(row[0] for row in self.buffer)
             return
-    except ValueError:
-        update_status("Quantity must be an integer, and Price must be a number.")
+        query_runner.submit('select', store.submit(store.matching_ids, **self._filter()), apply)
+
+    def on_click(self, event):
+        # A plain click starts a new selection, dropping rows selected off screen;
+        # Ctrl/Shift clicks extend it.
+        if not event.state & 0x0005 and self.tree.identify_region(event.x, event.y) in ('cell', 'tree'):
+            self.selected.clear()
+
+    def render(self):
+        """Bring the Treeview in line with the window, touching only rows that changed."""
+        started = time.perf_counter()
+        offset = self.top - self.buffer_start
+        rows = self.buffer[offset:offset + self.visible]
+        wanted = [str(row[0]) for row in rows]
+        wanted_set = set(wanted)
+
+        current = [iid for iid in self.tree.get_children() if iid in wanted_set]
+        stale = [iid for iid in self.rendered if iid not in wanted_set]
+        if stale:
+            self.tree.delete(*stale)
+        for iid in stale:
+            del self.rendered[iid]
+
+        for index, row in enumerate(rows):
+            iid = wanted[index]
+            shown = (format_inventory_row(row), ('low_stock',) if row[5] else ())
+            if iid not in self.rendered:
+                self.tree.insert('', index, iid=iid, values=shown[0], tags=shown[1])
+                current.insert(index, iid)
+            else:
+                if current[index] != iid:
+                    self.tree.move(iid, '', index)
+                    current.remove(iid)
+                    current.insert(index, iid)
+                if self.rendered[iid] != shown:
+                    self.tree.item(iid, values=shown[0], tags=shown[1])
+            self.rendered[iid] = shown
+
+        selection = [iid for iid in wanted if int(iid) in self.selected]
+        if set(selection) != set(self.tree.selection()):
+            self.tree.selection_set(selection)
+        self.tree.yview_moveto(0)
+        self.update_scrollbar()
+        profiler.record_ui("inventory render", time.perf_counter() - started, len(rows))
+
+    def is_rendered(self, item_id):
+        return self.tree.exists(item_id)
+
+    def update_scrollbar(self):
+        if self.total:
+            first = self.top / self.total
+            last = min(1.0, (self.top + self.visible) / self.total)
+        else:
+            first, last = 0.0, 1.0
+        self.scrollbar.set(first, last)
+
+    def yview(self, *args):
+        if args[0] == 'moveto':
+            self.scroll_to(int(float(args[1]) * self.total))
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            if args[2] == 'pages':
+                amount *= self.visible
+            self.scroll(amount)
+
+    def on_resize(self, event):
+        children = self.tree.get_children()
+        if children:
+            bbox = self.tree.bbox(children[0])
+            if bbox:
+                self.header_height = bbox[1]
+        visible = max(1, (event.height - self.header_height) // self.ROW_HEIGHT)
+        if visible != self.visible:
+            self.visible = visible
+            self.scroll_to(self.top)
+
+    def on_mousewheel(self, event):
+        return self.scroll(-3 if event.delta > 0 else 3)
+
+    def on_arrow(self, step):
+        # Inside the window the Treeview moves the focus itself; at the
+        # edges we scroll the window and carry the selection along.
+        children = self.tree.get_children()
+        if not children or self.tree.focus() != (children[-1] if step > 0 else children[0]):
+            return None
+
+        def select_edge():
+            children = self.tree.get_children()
+            if children:
+                edge = children[-1] if step > 0 else children[0]
+                self.tree.focus(edge)
+                self.tree.selection_set(edge)
+
+        return self.scroll(step, select_edge)
+
+def display_inventory(filter_text="", ranked=False, on_done=None):
+    inventory_view.reload(filter_text, ranked=ranked, on_done=on_done)
+
+def fill_item_form(row):
+    global selected_item_version
+    if not row or row[0] != selected_item_id:
+        return  # Item deleted or selection moved on while loading.
+    selected_item_version = row[6]  # Saving only applies if nobody changed the item since.
+    entry_widgets["Item Name"].delete(0, tk.END)
+    entry_widgets["Item Name"].insert(0, row[1])
+    entry_widgets["Quantity"].delete(0, tk.END)
+    entry_widgets["Quantity"].insert(0, row[2])
+    entry_widgets["Price"].delete(0, tk.END)
+    entry_widgets["Price"].insert(0, row[3])
+    entry_widgets["Updated By"].delete(0, tk.END)
+    entry_widgets["Updated By"].insert(0, row[4] if row[4] else '')
+    add_button.config(text="Update Item", bg=COLORS['accent'])
+    update_status(f"Loaded item ID {selected_item_id} for editing.")
+
+def item_loaded(row):
+    add_button.config(state='normal')
+    if row is None:
+        # Deleted since it was selected: without a loaded version, Update
+        # would blindly overwrite, so fall back to adding a new item.
+        clear_inputs()
+        update_status("The selected item no longer exists.")
         return
+    fill_item_form(row)
 
-    if is_duplicate_name(name, exclude_id=selected_item_id):
-        update_status(f"Item name '{name}' already exists.")
-        return
+def item_load_failed(error):
+    # Same as above: never leave Update armed for an item whose version is unknown.
+    clear_inputs()
+    add_button.config(state='normal')
+    messagebox.showerror("Database Error", f"Failed to load item: {error}")
 
-    try:
-        if selected_item_id is None:
-            c.execute(
-                "INSERT INTO inventory (item_name, quantity, price, updated_by) VALUES (?, ?, ?, ?)",
-                (name, quantity_int, price_float, user)
-            )
-            item_id = c.lastrowid
-            action = "Added"
-        else:
-            c.execute(
-                "UPDATE inventory SET item_name=?, quantity=?, price=?, updated_by=? WHERE id=?",
-                (name, quantity_int, price_float, user, selected_item_id)
-            )
-            item_id = selected_item_id
-            action = "Updated"
-
-        c.execute(
-            "INSERT INTO audit_log (action, item_id, item_name, user) VALUES (?, ?, ?, ?)",
-            (action, item_id, name, user)
-        )
+def cancel_item_load():
+    if 'item' in query_runner.latest:
+        query_runner.cancel('item')
+        add_button.config(state='normal')
 
-        try:
-            safe_commit(conn)
-            messagebox.showinfo("Success", f"Item {action.lower()} successfully!")
-        except sqlite3.Error as e:
-            messagebox.showerror("Database Error", f"Failed to save changes: {e}")
-            return
+def load_selected_item(event):
+    global selected_item_id, selected_item_version
+    if event is not None:
+        inventory_view.sync_selection()
+        selected = sorted(inventory_view.selected)
+    else:
+        selected = [int(iid) for iid in inventory_tree.selection()]
+    if len(selected) == 1:
+        if event is not None and selected[0] == selected_item_id:
+            return  # Re-selected by a virtual view refresh; keep pending edits.
+        selected_item_id = selected[0]
+        # Until the row loads, the form still shows the previous item: saving
+        # now would send its version (or its values) for this one.
+        selected_item_version = None
+        add_button.config(state='disabled')
+        query_runner.submit('item', store.submit(store.get_item, selected_item_id), item_loaded, item_load_failed)
+    elif selected:
+        cancel_item_load()
+        if selected_item_id is not None:
+            clear_inputs()
+        update_status(f"{len(selected):,} items selected. Right-click for batch actions.")
+    else:
+        cancel_item_load()
+        clear_inputs()
+
+def select_all_items(event=None):
+    def selected():
+        if len(inventory_view.selected) > 1:
+            cancel_item_load()
+            if selected_item_id is not None:
+                clear_inputs()
+        update_status(f"{len(inventory_view.selected):,} items selected. Right-click for batch actions.")
+
+    inventory_view.select_all(then=selected)
+    return "break"
 
+def selected_item_ids():
+    inventory_view.sync_selection()
+    return sorted(inventory_view.selected)
+
+def add_item():
+    item_id = selected_item_id
+    values = (entry_widgets["Item Name"].get(), entry_widgets["Quantity"].get(), entry_widgets["Price"].get(),
+              entry_widgets["Updated By"].get())
+
+    def on_saved(result):
+        action, saved_id = result
+        add_button.config(state='normal')
+        messagebox.showinfo("Success", f"Item {action.lower()} successfully!")
+        inventory_view.clear_selection()
         clear_inputs()
-        display_inventory()
+        inventory_view.refresh_item(saved_id, existed=item_id is not None)
         update_status(f"Item {action.lower()} successfully.")
+        low_stock_monitor.recheck([saved_id])
+
+    def on_save_failed(error):
+        add_button.config(state='normal')
+        if isinstance(error, ValidationError):
+            if isinstance(error, EditConflictError):
+                current = error.current
+                inventory_view.refresh_item(item_id)
+                if messagebox.askyesno("Edit Conflict", f"{error}\n\nNow: {current[1]}, quantity {current[2]}, "
+                                                        f"price {current[3]:.2f}.\n\n"
+                                                        "Overwrite it with your changes?"):
+                    save(current[6])
+                    return
+                fill_item_form(current)  # Start over from the current values.
+            elif isinstance(error, ItemNotFoundError):
+                clear_inputs()
+                inventory_view.refresh_item(item_id)  # Drop the row another station deleted.
+            update_status(str(error))
+        else:
+            messagebox.showerror("Database Error", f"Failed to save changes: {error}")
+
+    def save(expected_version):
+        add_button.config(state='disabled')
+        update_status("Saving...")
+        # The store validates the raw form values; rule violations come back as ValidationError.
+        query_runner.submit(None, store.submit(store.save_item, *values, item_id=item_id,
+                                               expected_version=expected_version),
+                            on_saved, on_save_failed)
 
-    except sqlite3.Error as e:
-        messagebox.showerror("Database Error", str(e))
+    save(selected_item_version)
 
 def delete_item():
-    selected = inventory_tree.selection()
-    if selected:
-        if not messagebox.askyesno("Confirm Delete", "Are you sure you want to delete the selected item?"):
-            update_status("Delete cancelled.")
-            return
-        item_id = int(selected[0])
-        try:
-            c.execute("SELECT item_name, updated_by FROM inventory WHERE id=?", (item_id,))
-            row = c.fetchone()
-            if row:
-                item_name, user = row
-            else:
-                item_name, user = "Unknown", "Unknown"
-
-            c.execute("DELETE FROM inventory WHERE id=?", (item_id,))
-            c.execute("INSERT INTO audit_log (action, item_id, item_name, user) VALUES (?, ?, ?, ?)",
-                      ("Deleted", item_id, item_name, user))
-            conn.commit()
-            messagebox.showinfo("Success", "Item deleted successfully!")
-            display_inventory()
-            clear_inputs()
-            update_status("Item deleted successfully.")
-        except sqlite3.Error as e:
-            messagebox.showerror("Database Error", f"Failed to delete item: {e}")
-    else:
+    item_ids = selected_item_ids()
+    if not item_ids:
         update_status("Select an item to delete.")
+        return
+    count = len(item_ids)
+    prompt = ("Are you sure you want to delete the selected item?" if count == 1
+              else f"Are you sure you want to delete the {count:,} selected items?")
+    if not messagebox.askyesno("Confirm Delete", prompt):
+        update_status("Delete cancelled.")
+        return
 
-def show_audit_log():
-    audit_window = tk.Toplevel(root)
-    audit_window.title("Audit Log")
-    audit_window.geometry("1000x650")
-    audit_window.configure(bg=COLORS['bg'])
-
-    header_frame = tk.Frame(audit_window, bg=COLORS['bg'])
-    header_frame.pack(fill='x', padx=20, pady=20)
-
-    title_label = tk.Label(header_frame, text="Audit Log", font=("Inter", 18, "bold"),
-                          bg=COLORS['bg'], fg=COLORS['text'])
-    title_label.pack(anchor='w')
-
-    content_frame = tk.Frame(audit_window, bg=COLORS['card'], relief='raised', bd=2)
-    content_frame.pack(fill='both', expand=True, padx=20, pady=(0, 20))
-    cols = ('ID', 'Action', 'Item ID', 'Item Name', 'User', 'Timestamp')
-    tree = ttk.Treeview(content_frame, columns=cols, show='headings', style="Modern.Treeview")
-    for col in cols:
-        tree.heading(col, text=col)
-        tree.column(col, anchor=tk.CENTER, width=120)
-    scrollbar_audit = ttk.Scrollbar(content_frame, orient=tk.VERTICAL, command=tree.yview,
-                                   style="Modern.Vertical.TScrollbar")
-    tree.configure(yscroll=scrollbar_audit.set)
-
-    tree.pack(side=tk.LEFT, fill='both', expand=True, padx=10, pady=10)
-    scrollbar_audit.pack(side=tk.RIGHT, fill=tk.Y, pady=10)
-    for row in c.execute("SELECT * FROM audit_log ORDER BY timestamp DESC"):
-        tree.insert('', 'end', values=row)
-
-def debounce(func, delay):
-    def wrapper(*args, **kwargs):
-        wrapper.timer = Timer(delay, func, args=args, kwargs=kwargs)
-        wrapper.timer.start()
-    return wrapper
+    def on_deleted(rows):
+        message = "Item deleted successfully" if count == 1 else f"{len(rows):,} items deleted successfully"
+        messagebox.showinfo("Success", message + "!")
+        inventory_view.clear_selection()
+        inventory_view.remove_items(rows)
+        low_stock_monitor.forget(row[0] for row in rows)
+        clear_inputs()
+        update_status(message + ".")
+
+    # One transaction and one view update, however many items are selected.
+    query_runner.submit(None, store.submit(store.delete_items, item_ids), on_deleted,
+                        lambda e: messagebox.showerror("Database Error", f"Failed to delete items: {e}"))
+
+last_batch_user = ""
+
+def ask_batch_user():
+    global last_batch_user
+    user = simpledialog.askstring("Updated By", "Name to record in the audit log:",
+                                  initialvalue=last_batch_user, parent=root)
+    if user is not None:
+        last_batch_user = user
+    return user
+
+def run_batch_update(update, item_ids, amount, changed_fields, describe):
+    user = ask_batch_user()
+    if user is None:
+        update_status("Batch update cancelled.")
+        return
 
-def on_search(event=None):
-    if hasattr(on_search, 'timer'):
-        on_search.timer.cancel()
-    on_search.debounced_filter()
+    def on_updated(updated_ids):
+        inventory_view.refresh_items(updated_ids, changed_fields)
+        update_status(describe(len(updated_ids)))
+        if {"quantity", "low_stock_threshold"} & set(changed_fields):
+            low_stock_monitor.recheck(updated_ids)
 
-on_search.debounced_filter = debounce(lambda: display_inventory(search_entry.get()), 0.5)
+    def on_failed(error):
+        if isinstance(error, ValidationError):
+            update_status(str(error))
+            messagebox.showwarning("Batch Update", str(error))
+        else:
+            messagebox.showerror("Database Error", f"Failed to update items: {error}")
 
-def generate_excel_report_async():
-    def worker():
-        timestamp = datetime.now().strftime("%Y_%m_%d")
-        default_filename = f"inventory_audit_report_{timestamp}.xlsx"
-        filepath = filedialog.asksaveasfilename(defaultextension=".xlsx", initialfile=default_filename,
-                                                filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")])
-        if filepath:
-            try:
-                wb = openpyxl.Workbook()
+    update_status(f"Updating {len(item_ids):,} items...")
+    query_runner.submit(None, store.submit(update, item_ids, amount, user), on_updated, on_failed)
 
-                # Create inventory sheet
-                ws_inventory = wb.active
-                ws_inventory.title = "Inventory"
-                inventory_headers = ['ID', 'Item Name', 'Quantity', 'Price', 'Updated By']
-                ws_inventory.append(inventory_headers)
-                for col_num, header in enumerate(inventory_headers, 1):
-                    ws_inventory.cell(row=1, column=col_num).font = Font(bold=True)
+def adjust_selected_quantities():
+    item_ids = selected_item_ids()
+    if not item_ids:
+        update_status("Select items to adjust.")
+        return
+    delta = simpledialog.askinteger("Adjust Quantity",
+                                    f"Change the quantity of {len(item_ids):,} item(s) by\n(use a negative number to remove stock):",
+                                    parent=root)
+    if delta is None:
+        return
+    run_batch_update(store.adjust_quantities, item_ids, delta, ("quantity", "updated_by"),
+                     lambda count: f"Adjusted the quantity of {count:,} items by {delta:+d}.")
 
-                c.execute("SELECT id, item_name, quantity, price, updated_by FROM inventory")
-                inventory_rows = c.fetchall()
+def change_selected_prices():
+    item_ids = selected_item_ids()
+    if not item_ids:
+        update_status("Select items to reprice.")
+        return
+    percent = simpledialog.askfloat("Change Price",
+                                    f"Change the price of {len(item_ids):,} item(s) by percent\n(e.g. 5 or -10):",
+                                    minvalue=-100, parent=root)
+    if percent is None:
+        return
+    run_batch_update(store.change_prices, item_ids, percent, ("price", "updated_by"),
+                     lambda count: f"Changed the price of {count:,} items by {percent:+g}%.")
 
-                for row in inventory_rows:
-                    ws_inventory.append(row)
+def set_selected_thresholds():
+    item_ids = selected_item_ids()
+    if not item_ids:
+        update_status("Select items to set a low-stock threshold for.")
+        return
+    threshold = simpledialog.askinteger("Low-Stock Threshold",
+                                        f"Alert when the quantity of {len(item_ids):,} item(s) falls below:",
+                                        minvalue=0, parent=root)
+    if threshold is None:
+        return
+    run_batch_update(store.set_low_stock_threshold, item_ids, threshold, ("low_stock_threshold", "updated_by"),
+                     lambda count: f"Set the low-stock threshold of {count:,} items to {threshold:,}.")
+
+# --- Low Stock ---
+class LowStockMonitor:
+    """Tracks which items are below their low-stock threshold.
+
+    A full pass reads only the idx_low_stock partial index, so it costs as
+    much as the number of low items, not the size of the table. It runs at
+    startup, after imports and every ``POLL_MS`` (to pick up writes from
+    other instances). After this app's own writes only the touched items are
+    re-checked, and items that newly fall below their threshold are announced
+    in the status bar.
+    """
+    POLL_MS = 60000
+
+    def __init__(self, widget, check):
+        self.widget = widget
+        self.check = check
+        self.low_ids = set()
+        self.poll_id = None
+
+    def refresh(self):
+        if self.poll_id is not None:
+            self.widget.after_cancel(self.poll_id)
+            self.poll_id = None
+        query_runner.submit('low_stock', store.submit(store.low_stock_ids), self._replace, self._failed)
+
+    def _replace(self, item_ids):
+        self.low_ids = set(item_ids)
+        self._show()
+        self.poll_id = self.widget.after(self.POLL_MS, self.refresh)
+
+    def _failed(self, error):
+        log.warning("Low-stock check failed: %s", error)
+        self.poll_id = self.widget.after(self.POLL_MS, self.refresh)
+
+    def recheck(self, item_ids):
+        """Re-evaluate just ``item_ids`` after they were written."""
+        item_ids = list(item_ids)
+
+        def merge(low):
+            low = set(low)
+            newly_low = low - self.low_ids
+            self.low_ids.difference_update(item_ids)
+            self.low_ids |= low
+            self._show()
+            if len(newly_low) == 1:
+                update_status(f"Low stock: item ID {next(iter(newly_low))} is below its threshold.")
+            elif newly_low:
+                update_status(f"Low stock: {len(newly_low):,} items fell below their threshold.")
+
+        query_runner.submit(None, store.submit(store.low_stock_ids, item_ids), merge, self._failed_recheck)
+
+    def _failed_recheck(self, error):
+        log.warning("Low-stock check failed: %s", error)
+
+    def forget(self, item_ids):
+        self.low_ids.difference_update(item_ids)
+        self._show()
+
+    def _show(self):
+        self.check.config(text=f"Low stock only ({len(self.low_ids):,})",
+                          fg=COLORS['danger'] if self.low_ids else COLORS['text'])
+
+def toggle_low_stock_filter():
+    inventory_view.reload(low_stock=low_stock_var.get())
+
+# --- Audit Log Viewer ---
+AUDIT_ACTIONS = ("All", "Added", "Updated", "Deleted")
+
+class AuditLogViewer:
+    """Audit log window that loads rows a page at a time, newest first.
+
+    Pages are keyset seeks on ``(timestamp, id)`` backed by the audit_log
+    indexes, so the first screen is instant however long the log is. The
+    next page is fetched when the scrollbar nears the bottom.
+    """
+    LOAD_MORE_AT = 0.9
+
+    def __init__(self, parent, item_id=None):
+        self.item_id = item_id
+        self.filters = {}
+        self.last_key = None
+        self.exhausted = False
+        self.loading = False
+        self.row_count = 0
+        self.channel = ('audit', id(self))
+
+        self.window = tk.Toplevel(parent)
+        self.window.title("Audit Log" if item_id is None else f"Audit Log - Item {item_id}")
+        self.window.geometry("1250x650")
+        self.window.configure(bg=COLORS['bg'])
+
+        header_frame = tk.Frame(self.window, bg=COLORS['bg'])
+        header_frame.pack(fill='x', padx=20, pady=20)
+
+        title_label = tk.Label(header_frame, text=self.window.title(), font=("Inter", 18, "bold"),
+                               bg=COLORS['bg'], fg=COLORS['text'])
+        title_label.pack(anchor='w')
+
+        filter_frame = tk.Frame(header_frame, bg=COLORS['bg'])
+        filter_frame.pack(fill='x', pady=(10, 0))
+        self.filter_entries = {}
+        for label_text in ("From (YYYY-MM-DD)", "To", "User"):
+            tk.Label(filter_frame, text=label_text, font=("Inter", 10), bg=COLORS['bg'],
+                     fg=COLORS['text']).pack(side='left', padx=(0, 5))
+            entry = create_modern_entry(filter_frame, width=12)
+            entry.pack(side='left', padx=(0, 15))
+            entry.bind('<Return>', lambda e: self.apply_filters())
+            self.filter_entries[label_text] = entry
+        tk.Label(filter_frame, text="Action", font=("Inter", 10), bg=COLORS['bg'],
+                 fg=COLORS['text']).pack(side='left', padx=(0, 5))
+        self.action_var = tk.StringVar(value=AUDIT_ACTIONS[0])
+        action_box = ttk.Combobox(filter_frame, textvariable=self.action_var, values=AUDIT_ACTIONS,
+                                  state='readonly', width=10)
+        action_box.pack(side='left', padx=(0, 15))
+        action_box.bind('<<ComboboxSelected>>', lambda e: self.apply_filters())
+        create_modern_button(filter_frame, "Apply", self.apply_filters, padx=15, pady=4).pack(side='left')
+
+        self.count_label = tk.Label(header_frame, text="", font=("Inter", 10),
+                                    bg=COLORS['bg'], fg=COLORS['text_light'])
+        self.count_label.pack(anchor='w', pady=(8, 0))
+
+        content_frame = tk.Frame(self.window, bg=COLORS['card'], relief='raised', bd=2)
+        content_frame.pack(fill='both', expand=True, padx=20, pady=(0, 20))
+        cols = ('ID', 'Action', 'Item ID', 'Item Name', 'User', 'Timestamp', 'Changes')
+        self.tree = ttk.Treeview(content_frame, columns=cols, show='headings', style="Modern.Treeview")
+        for col in cols:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, anchor=tk.CENTER, width=120)
+        self.tree.column('Changes', anchor=tk.W, width=360)
+        self.scrollbar = ttk.Scrollbar(content_frame, orient=tk.VERTICAL, command=self.tree.yview,
+                                       style="Modern.Vertical.TScrollbar")
+        self.tree.configure(yscroll=self.on_yscroll)
+
+        self.tree.pack(side=tk.LEFT, fill='both', expand=True, padx=10, pady=10)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=10)
+
+        self.apply_filters()
+
+    def apply_filters(self):
+        date_from = self.filter_entries["From (YYYY-MM-DD)"].get().strip()
+        date_to = self.filter_entries["To"].get().strip()
+        for value in (date_from, date_to):
+            if value:
+                try:
+                    datetime.strptime(value, "%Y-%m-%d")
+                except ValueError:
+                    self.count_label.config(text=f"Invalid date '{value}', use YYYY-MM-DD.")
+                    return
+        action = self.action_var.get()
+        self.filters = {
+            "date_from": date_from,
+            "date_to": date_to,
+            "user": self.filter_entries["User"].get().strip(),
+            "action": "" if action == AUDIT_ACTIONS[0] else action,
+            "item_id": self.item_id,
+        }
+        self.tree.delete(*self.tree.get_children())
+        self.row_count = 0
+        self.last_key = None
+        self.exhausted = False
+        self.load_more()
+
+    def load_more(self):
+        self.loading = True
+        query_runner.submit(self.channel, store.submit(store.audit_page, self.filters, self.last_key),
+                            self.append_rows, self.load_failed)
+
+    def append_rows(self, rows):
+        self.loading = False
+        if not self.tree.winfo_exists():
+            return  # Window closed before the query finished.
+        started = time.perf_counter()
+        for row in rows:
+            self.tree.insert('', 'end', values=row[:6] + (format_changes(row[6]),))
+        profiler.record_ui("audit page render", time.perf_counter() - started, len(rows))
+        self.row_count += len(rows)
+        if rows:
+            self.last_key = (rows[-1][5], rows[-1][0])
+        self.exhausted = len(rows) < AUDIT_PAGE_SIZE
+        more = "" if self.exhausted else " (scroll for more)"
+        self.count_label.config(text=f"Showing {self.row_count:,} entries{more}")
+
+    def load_failed(self, error):
+        self.loading = False
+        messagebox.showerror("Database Error", f"Failed to load audit log: {error}")
+
+    def on_yscroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if float(last) >= self.LOAD_MORE_AT and not self.loading and not self.exhausted:
+            self.load_more()
 
-                inventory_col_widths = [5, 30, 10, 12, 20]
-                for i, width in enumerate(inventory_col_widths, 1):
-                    ws_inventory.column_dimensions[openpyxl.utils.get_column_letter(i)].width = width
+def show_audit_log():
+    AuditLogViewer(root)
 
-                # Create audit log sheet
-                ws_audit = wb.create_sheet(title="Audit Log")
-                audit_headers = ['ID', 'Action', 'Item ID', 'Item Name', 'User', 'Timestamp']
-                ws_audit.append(audit_headers)
-                for col_num, header in enumerate(audit_headers, 1):
-                    ws_audit.cell(row=1, column=col_num).font = Font(bold=True)
+def show_item_history():
+    selected = inventory_tree.selection()
+    if selected:
+        AuditLogViewer(root, item_id=int(selected[0]))
+
+class DiagnosticsPanel:
+    """Debug window over the query profiler: per-statement timings, plan warnings and UI timings.
+
+    Statements whose query plan scans a whole table or sorts without an index
+    are highlighted, with the offending plan steps listed underneath. The
+    tables refresh every ``REFRESH_MS`` while the window is open.
+    """
+    REFRESH_MS = 1000
+
+    def __init__(self, parent):
+        self.window = tk.Toplevel(parent)
+        self.window.title("Diagnostics")
+        self.window.geometry("1100x700")
+        self.window.configure(bg=COLORS['bg'])
+
+        header_frame = tk.Frame(self.window, bg=COLORS['bg'])
+        header_frame.pack(fill='x', padx=20, pady=(20, 10))
+        tk.Label(header_frame, text="Diagnostics", font=("Inter", 18, "bold"),
+                 bg=COLORS['bg'], fg=COLORS['text']).pack(side='left')
+        create_modern_button(header_frame, "Export Metrics", self.export, padx=15, pady=4).pack(side='right')
+        create_modern_button(header_frame, "Reset", self.reset, bg_color=COLORS['secondary'],
+                             padx=15, pady=4).pack(side='right', padx=(0, 10))
+        self.summary_label = tk.Label(self.window, text="", font=("Inter", 10), anchor='w',
+                                      bg=COLORS['bg'], fg=COLORS['text_light'])
+        self.summary_label.pack(fill='x', padx=20)
+
+        self.statements = self._table(("Statement", "Calls", "Total ms", "Avg ms", "Max ms", "Rows"),
+                                      (560, 60, 90, 80, 80, 80), height=12)
+        self.statements.tag_configure('warning', background='#fee2e2')
+        self.ui_timings = self._table(("UI Step", "Calls", "Avg ms", "Max ms", "Last ms", "Rows"),
+                                      (560, 60, 90, 80, 80, 80), height=4)
+        self.warnings = tk.Listbox(self.window, height=6, font=("Consolas", 9), bg=COLORS['card'],
+                                   fg=COLORS['danger'], relief='flat')
+        self.warnings.pack(fill='x', padx=20, pady=(0, 20))
+
+        self.refresh()
+
+    def _table(self, cols, widths, height):
+        frame = tk.Frame(self.window, bg=COLORS['card'], relief='raised', bd=2)
+        frame.pack(fill='both', expand=True, padx=20, pady=(10, 10))
+        tree = ttk.Treeview(frame, columns=cols, show='headings', style="Modern.Treeview", height=height)
+        for col, width in zip(cols, widths):
+            tree.heading(col, text=col)
+            tree.column(col, width=width, anchor=tk.W if col in ("Statement", "UI Step") else tk.E)
+        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview, style="Modern.Vertical.TScrollbar")
+        tree.configure(yscroll=scrollbar.set)
+        tree.pack(side=tk.LEFT, fill='both', expand=True, padx=10, pady=10)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=10)
+        return tree
+
+    def refresh(self):
+        if not self.window.winfo_exists():
+            return
+        summary = profiler.summary()
+        self.summary_label.config(text=f"{summary['queries']:,} queries across {summary['statements']:,} statements, "
+                                       f"{summary['query_ms']:,.0f} ms in SQLite, "
+                                       f"{summary['warnings']} statements with full scans or temp sorts")
+
+        self.statements.delete(*self.statements.get_children())
+        for stats in profiler.statement_stats():
+            self.statements.insert('', 'end', tags=('warning',) if stats['warnings'] else (), values=(
+                stats['sql'], stats['calls'], f"{stats['total_ms']:.1f}", f"{stats['avg_ms']:.2f}",
+                f"{stats['max_ms']:.2f}", stats['rows']))
+        self.ui_timings.delete(*self.ui_timings.get_children())
+        for stats in profiler.ui_stats():
+            self.ui_timings.insert('', 'end', values=(
+                stats['name'], stats['calls'], f"{stats['avg_ms']:.2f}", f"{stats['max_ms']:.2f}",
+                f"{stats['last_ms']:.2f}", stats['rows']))
+        self.warnings.delete(0, tk.END)
+        for sql, steps in list(profiler.warnings.items()):
+            self.warnings.insert(tk.END, f"{'; '.join(steps)}  <-  {sql}")
+
+        self.window.after(self.REFRESH_MS, self.refresh)
+
+    def reset(self):
+        profiler.reset()
+        self.refresh()
+
+    def export(self):
+        timestamp = datetime.now().strftime("%Y_%m_%d_%H%M%S")
+        filepath = filedialog.asksaveasfilename(parent=self.window, defaultextension=".jsonl",
+                                                initialfile=f"inventory_metrics_{timestamp}.jsonl",
+                                                filetypes=[("JSON Lines", "*.jsonl"), ("All files", "*.*")])
+        if not filepath:
+            return
+        try:
+            profiler.export(filepath)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to export metrics: {e}", parent=self.window)
+            return
+        messagebox.showinfo("Metrics Exported", f"Metrics log saved:\n{filepath}", parent=self.window)
+
+def show_diagnostics(event=None):
+    DiagnosticsPanel(root)
+
+# --- Dashboard ---
+class DashboardPanel:
+    """Manager dashboard: stock totals and per-user activity for the last ``DASHBOARD_DAYS`` days.
+
+    The figures come from summary tables that triggers keep current, so a
+    refresh is a couple of small lookups however large the inventory and
+    audit log grow. The panel refreshes every ``REFRESH_MS`` while open.
+    """
+    REFRESH_MS = 5000
+
+    def __init__(self, parent):
+        self.window = tk.Toplevel(parent)
+        self.window.title("Dashboard")
+        self.window.geometry("760x600")
+        self.window.configure(bg=COLORS['bg'])
+
+        header_frame = tk.Frame(self.window, bg=COLORS['bg'])
+        header_frame.pack(fill='x', padx=20, pady=(20, 10))
+        tk.Label(header_frame, text="Dashboard", font=("Inter", 18, "bold"),
+                 bg=COLORS['bg'], fg=COLORS['text']).pack(side='left')
+        create_modern_button(header_frame, "Refresh", self.refresh, padx=15, pady=4).pack(side='right')
+
+        totals_frame = tk.Frame(self.window, bg=COLORS['bg'])
+        totals_frame.pack(fill='x', padx=20)
+        self.totals = {}
+        for column, (key, title) in enumerate((("items", "Items"), ("quantity", "Units in Stock"),
+                                               ("value", "Stock Value"), ("low_stock", "Low Stock"))):
+            card = tk.Frame(totals_frame, bg=COLORS['card'], relief='raised', bd=2)
+            card.grid(row=0, column=column, sticky='nsew', padx=(0 if column == 0 else 10, 0))
+            totals_frame.columnconfigure(column, weight=1)
+            tk.Label(card, text=title, font=("Inter", 10), bg=COLORS['card'],
+                     fg=COLORS['text_light']).pack(anchor='w', padx=10, pady=(8, 0))
+            self.totals[key] = tk.Label(card, text="...", font=("Inter", 16, "bold"),
+                                        bg=COLORS['card'], fg=COLORS['text'])
+            self.totals[key].pack(anchor='w', padx=10, pady=(0, 8))
+
+        tk.Label(self.window, text=f"Edits per user, last {DASHBOARD_DAYS} days (UTC)", font=("Inter", 12, "bold"),
+                 bg=COLORS['bg'], fg=COLORS['text']).pack(anchor='w', padx=20, pady=(15, 0))
+        frame = tk.Frame(self.window, bg=COLORS['card'], relief='raised', bd=2)
+        frame.pack(fill='both', expand=True, padx=20, pady=(5, 20))
+        cols = ("Day", "User", "Added", "Updated", "Deleted", "Total")
+        self.activity = ttk.Treeview(frame, columns=cols, show='headings', style="Modern.Treeview")
+        for col, width in zip(cols, (110, 200, 80, 80, 80, 80)):
+            self.activity.heading(col, text=col)
+            self.activity.column(col, width=width, anchor=tk.W if col in ("Day", "User") else tk.E)
+        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self.activity.yview,
+                                  style="Modern.Vertical.TScrollbar")
+        self.activity.configure(yscroll=scrollbar.set)
+        self.activity.pack(side=tk.LEFT, fill='both', expand=True, padx=10, pady=10)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=10)
+
+        self.refresh_id = None
+        self.refresh()
+
+    def refresh(self):
+        if not self.window.winfo_exists():
+            return
+        if self.refresh_id is not None:
+            self.window.after_cancel(self.refresh_id)
+        self.refresh_id = self.window.after(self.REFRESH_MS, self.refresh)
+        query_runner.submit('dashboard', store.submit(store.dashboard), self.show,
+                            lambda e: messagebox.showerror("Database Error", f"Failed to load the dashboard: {e}",
+                                                           parent=self.window))
+
+    def show(self, figures):
+        if not self.window.winfo_exists():
+            return
+        started = time.perf_counter()
+        self.totals['items'].config(text=f"{figures['items']:,}")
+        self.totals['quantity'].config(text=f"{figures['quantity']:,}")
+        self.totals['value'].config(text=f"${figures['value']:,.2f}")
+        self.totals['low_stock'].config(text=f"{figures['low_stock']:,}",
+                                        fg=COLORS['danger'] if figures['low_stock'] else COLORS['text'])
+        self.activity.delete(*self.activity.get_children())
+        for row in figures['activity']:
+            self.activity.insert('', 'end', values=(row[0], row[1] or 'N/A') + tuple(f"{n:,}" for n in row[2:]))
+        profiler.record_ui("dashboard render", time.perf_counter() - started, len(figures['activity']))
+
+def show_dashboard():
+    DashboardPanel(root)
+
+class SearchScheduler:
+    """Debounces search keystrokes into at most one in-flight search.
+
+    Every keystroke restarts a ``delay_ms`` timer with ``after``/``after_cancel``,
+    so it all runs on the Tk thread. When the timer fires, ``run(query, done)``
+    starts a search unless the query already matches ``current()``. While a
+    search is in flight, further requests only mark it stale; when it finishes
+    the latest query (and only that one) runs next. Search durations are kept
+    in ``timings`` (milliseconds) and passed to ``report``.
+    """
+    DELAY_MS = 300
+
+    def __init__(self, widget, get_query, current, run, report=None, delay_ms=DELAY_MS):
+        self.widget = widget
+        self.get_query = get_query
+        self.current = current
+        self.run = run
+        self.report = report
+        self.delay_ms = delay_ms
+        self.timer = None
+        self.in_flight = False
+        self.stale = False
+        self.started = 0.0
+        self.timings = deque(maxlen=100)
+
+    def schedule(self, delay_ms=None):
+        if self.timer is not None:
+            self.widget.after_cancel(self.timer)
+        self.timer = self.widget.after(self.delay_ms if delay_ms is None else delay_ms, self._fire)
+
+    def _fire(self):
+        self.timer = None
+        if self.in_flight:
+            self.stale = True
+            return
+        query = self.get_query()
+        if query == self.current():
+            return
+        self.in_flight = True
+        self.started = time.perf_counter()
+        self.run(query, lambda: self._finished(query))
+
+    def _finished(self, query):
+        elapsed_ms = (time.perf_counter() - self.started) * 1000
+        self.timings.append(elapsed_ms)
+        self.in_flight = False
+        if self.report is not None:
+            self.report(query, elapsed_ms)
+        if self.stale:
+            self.stale = False
+            self._fire()
+
+    def stats(self):
+        if not self.timings:
+            return {"searches": 0}
+        ordered = sorted(self.timings)
+        return {"searches": len(ordered), "last_ms": self.timings[-1],
+                "median_ms": ordered[len(ordered) // 2], "max_ms": ordered[-1]}
+
+def run_search(query, done):
+    filter_text, ranked = query
+    display_inventory(filter_text, ranked=ranked, on_done=done)
+
+def report_search(query, elapsed_ms):
+    if query[0]:
+        update_status(f"{inventory_view.total:,} matching items ({elapsed_ms:.0f} ms)")
 
-                c.execute("SELECT id, action, item_id, item_name, user, timestamp FROM audit_log ORDER BY timestamp DESC")
-                audit_rows = c.fetchall()
+def on_search(event=None):
+    search_scheduler.schedule()
 
-                for row in audit_rows:
-                    ws_audit.append(row)
+def generate_excel_report_async():
+    timestamp = datetime.now().strftime("%Y_%m_%d")
+    default_filename = f"inventory_audit_report_{timestamp}.xlsx"
+    filepath = filedialog.asksaveasfilename(defaultextension=".xlsx", initialfile=default_filename,
+                                            filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")])
+    if not filepath:
+        return
+    # Older entries are read from the archive, so a long range makes a large report.
+    default_from = (datetime.now() - timedelta(days=AUDIT_RETENTION_DAYS)).strftime("%Y-%m-%d")
+    date_from = simpledialog.askstring("Audit Log Range",
+                                       "Include audit entries from (YYYY-MM-DD, blank for the full history):",
+                                       initialvalue=default_from, parent=root)
+    if date_from is None:
+        return
+    date_from = date_from.strip()
+    as_of = simpledialog.askstring("Inventory Date",
+                                   "Show the inventory as of (YYYY-MM-DD, blank for today):", parent=root)
+    if as_of is None:
+        return
+    as_of = as_of.strip()
+    for value in (date_from, as_of):
+        if value:
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                messagebox.showerror("Error", f"Invalid date '{value}', use YYYY-MM-DD.")
+                return
+    # A historical report shows the audit log up to the same day.
+    audit_filters = {"date_from": date_from, "date_to": as_of}
+
+    report_button.config(state='disabled')
+    update_status("Generating report...")
+
+    def report_progress(sheet, written, total):
+        query_runner.post(update_status, f"Writing {sheet}: {written:,} of {total:,} rows...")
+
+    def finish(success, message):
+        report_button.config(state='normal')
+        if success:
+            update_status("Report generated.")
+            messagebox.showinfo("Report Generated", message)
+        else:
+            update_status("Report generation failed.")
+            messagebox.showerror("Error", message)
+
+    query_runner.submit('report', store.submit(store.export_report, filepath, report_progress, audit_filters,
+                                               as_of=as_of or None),
+                        lambda _: finish(True, f"Excel report saved successfully:\n{filepath}"),
+                        lambda e: finish(False, f"Failed to save report: {e}"))
+
+def import_items_async():
+    filepath = filedialog.askopenfilename(title="Import Items",
+                                          filetypes=[("Spreadsheets", "*.csv *.xlsx"), ("CSV files", "*.csv"),
+                                                     ("Excel files", "*.xlsx"), ("All files", "*.*")])
+    if not filepath:
+        return
 
-                audit_col_widths = [5, 12, 8, 30, 20, 22]
-                for i, width in enumerate(audit_col_widths, 1):
-                    ws_audit.column_dimensions[openpyxl.utils.get_column_letter(i)].width = width
+    import_button.config(state='disabled')
+    update_status("Importing items...")
 
-                wb.save(filepath)
-                root.after(0, lambda: messagebox.showinfo("Report Generated", f"Excel report saved successfully:\n{filepath}"))
-            except Exception as e:
-                root.after(0, lambda: messagebox.showerror("Error", f"Failed to save report: {e}"))
+    def import_progress(imported, rejected):
+        query_runner.post(update_status, f"Importing: {imported:,} added, {rejected:,} rejected...")
 
-    Thread(target=worker).start()
+    def finish(message, success):
+        import_button.config(state='normal')
+        display_inventory(inventory_view.filter_text, ranked=inventory_view.ranked)
+        low_stock_monitor.refresh()
+        update_status(message.splitlines()[0])
+        if success:
+            messagebox.showinfo("Import Complete", message)
+        else:
+            messagebox.showerror("Import Failed", message)
+
+    def run_import():
+        started = time.perf_counter()
+        result = store.import_rows(read_rows(filepath), on_progress=import_progress)
+        message = (f"Imported {result.imported:,} items, rejected {result.rejected:,} "
+                   f"in {time.perf_counter() - started:.1f}s.")
+        if result.rejects:
+            rejects_path = os.path.splitext(filepath)[0] + "_rejects.csv"
+            write_rejects(rejects_path, result.rejects)
+            message += f"\nRejected rows were written to:\n{rejects_path}"
+        return message
+
+    query_runner.submit('import', store.submit(run_import), lambda message: finish(message, True),
+                        lambda e: finish(f"Failed to import items: {e}", False))
 
 def show_context_menu(event):
     item = inventory_tree.identify_row(event.y)
     if item:
-        inventory_tree.selection_set(item)
+        if item not in inventory_tree.selection():
+            inventory_view.clear_selection()
+            inventory_tree.selection_set(item)
         context_menu.post(event.x_root, event.y_root)
     return "break"
 
@@ -475,22 +1522,10 @@ def duplicate_item():
         entry_widgets["Updated By"].insert(0, values[4])
         update_status("Item duplicated. Review and click Add Item to save.")
 
-def treeview_sort_column(tree, col, reverse):
-    items = [(tree.set(item, col), item) for item in tree.get_children('')]
-
-    if col in ["Quantity"]:
-        items = [(int(value.replace(',', '')), item) for value, item in items]
-    elif col in ["Price"]:
-        items = [(float(value.replace('$', '').replace(',', '')), item) for value, item in items]
-    elif col in ["ID"]:
-        items = [(int(value), item) for value, item in items]
-
-    items.sort(reverse=reverse)
-
-    for index, (val, item) in enumerate(items):
-        tree.move(item, '', index)
-
-    tree.heading(col, command=lambda: treeview_sort_column(tree, col, not reverse))
+def sort_inventory(column):
+    # An explicit column sort replaces relevance ranking.
+    ranked_search_var.set(False)
+    inventory_view.sort_by(column)
 
 def create_modern_button(parent, text, command,
                          bg_color=COLORS['primary'],
@@ -529,12 +1564,29 @@ def resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
+def load_scaled_image(path, size):
+    """Return ``path`` scaled to ``size`` as a PhotoImage, via a cached pre-scaled PNG.
+
+    Tk reads the cached PNG directly; PIL is only imported to rebuild the
+    cache when it is missing or older than the source image.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    cache_path = os.path.join(os.path.dirname(get_db_path()), f".{name}_{size[0]}x{size[1]}.png")
+    if not os.path.exists(cache_path) or os.path.getmtime(cache_path) < os.path.getmtime(path):
+        from PIL import Image
+
+        with Image.open(path) as image:
+            image.resize(size, Image.LANCZOS).save(cache_path, "PNG")
+    return tk.PhotoImage(file=cache_path)
+
 def on_closing():
     if messagebox.askokcancel("Close/End", "Do you want to close the application?"):
-        conn.close()
+        store.close()
         root.destroy()
 
 # --- Main Application Setup ---
+# Schema migrations and fallbacks are logged by inventory_schema.
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 root = tk.Tk()
 root.title("Inventory Management System")
 root.geometry("1300x950")
@@ -599,9 +1651,7 @@ input_frame.config(width=440)
 # Load and display logo if available
 try:
     logo_small_path = resource_path("C:/Users/klyde/Documents/Nursing Experts Sevices/Python/Inventory_Project/NE2.PNG")
-    logo_small_img_raw = Image.open(logo_small_path)
-    logo_small_img_raw = logo_small_img_raw.resize((300, 60), Image.LANCZOS)
-    logo_small_img = ImageTk.PhotoImage(logo_small_img_raw)
+    logo_small_img = load_scaled_image(logo_small_path, (300, 60))
     logo_small_label = tk.Label(input_frame.canvas, image=logo_small_img, bg=COLORS['card'])
     logo_small_label.image = logo_small_img
     logo_small_label.place(x=20, y=10)
@@ -616,6 +1666,8 @@ input_title.place(x=20, y=120)
 # Entry fields labels and entries
 labels_texts = ["Item Name", "Quantity", "Price", "Updated By"]
 entry_widgets = {}
+selected_item_id = None
+selected_item_version = None
 
 # Validation commands
 vcmd_int = (root.register(validate_non_negative_int), '%P')
@@ -636,7 +1688,7 @@ for i, label_text in enumerate(labels_texts):
 
 # Action Buttons Section
 action_frame = tk.Frame(input_frame.canvas, bg=COLORS['card'])
-action_frame.place(x=20, y=520, width=380, height=200)
+action_frame.place(x=20, y=520, width=380, height=260)
 primary_frame = tk.Frame(action_frame, bg=COLORS['card'])
 primary_frame.pack(fill='x', pady=(0, 15))
 add_button = create_modern_button(primary_frame, "Add Item", add_item, bg_color=COLORS['primary'], padx=20, pady=8)
@@ -647,21 +1699,38 @@ delete_button.pack(side='left')
 # Search Section
 search_label = tk.Label(input_frame.canvas, text="Search Item:", font=("Inter", 12), bg=COLORS['card'], fg=COLORS['text'])
 search_label.place(x=20, y=475)
-search_entry = create_modern_entry(input_frame.canvas, width=28)
+search_entry = create_modern_entry(input_frame.canvas, width=20)
 search_entry.place(x=130, y=475)
 search_entry.bind('<KeyRelease>', on_search)
+ranked_search_var = tk.BooleanVar(value=False)
+ranked_search_check = tk.Checkbutton(input_frame.canvas, text="Best match", variable=ranked_search_var,
+                                     command=on_search, font=("Inter", 10), bg=COLORS['card'],
+                                     fg=COLORS['text'], activebackground=COLORS['card'])
+ranked_search_check.place(x=330, y=476)
+search_scheduler = SearchScheduler(root,
+                                   get_query=lambda: (search_entry.get(), ranked_search_var.get()),
+                                   current=lambda: (inventory_view.filter_text, inventory_view.ranked),
+                                   run=run_search, report=report_search)
 
 # Audit Section
 audit_frame = tk.Frame(action_frame, bg=COLORS['card'])
 audit_frame.pack(fill='x', pady=(0, 15))
 audit_log_button = create_modern_button(audit_frame, "View Audit Log", show_audit_log, bg_color=COLORS['accent'], padx=20, pady=8)
 audit_log_button.pack(side='left', padx=(0, 10))
+diagnostics_button = create_modern_button(audit_frame, "Diagnostics", show_diagnostics, bg_color=COLORS['secondary'], padx=20, pady=8)
+diagnostics_button.pack(side='left')
+insights_frame = tk.Frame(action_frame, bg=COLORS['card'])
+insights_frame.pack(fill='x', pady=(0, 15))
+dashboard_button = create_modern_button(insights_frame, "Dashboard", show_dashboard, bg_color=COLORS['accent'], padx=20, pady=8)
+dashboard_button.pack(side='left')
 
 # Reports Section
 reports_frame = tk.Frame(action_frame, bg=COLORS['card'])
 reports_frame.pack(fill='x')
 report_button = create_modern_button(reports_frame, "Generate Report", generate_excel_report_async, bg_color=COLORS['primary'], padx=30, pady=8)
-report_button.pack(side='left')
+report_button.pack(side='left', padx=(0, 10))
+import_button = create_modern_button(reports_frame, "Import Items", import_items_async, bg_color=COLORS['secondary'], padx=20, pady=8)
+import_button.pack(side='left')
 
 # Right side: Inventory Table Frame (expanded to fill remaining space)
 inventory_frame = RoundedFrame(main_frame, bg_color=COLORS['card'], border_color=COLORS['border'],
@@ -670,13 +1739,18 @@ inventory_frame.pack(side='right', fill='both', expand=True)
 inventory_label = tk.Label(inventory_frame.canvas, text="Inventory", font=("Inter", 18, "bold"),
                            bg=COLORS['card'], fg=COLORS['text'])
 inventory_label.place(x=0, y=10)
+low_stock_var = tk.BooleanVar(value=False)
+low_stock_check = tk.Checkbutton(inventory_frame.canvas, text="Low stock only", variable=low_stock_var,
+                                 command=toggle_low_stock_filter, font=("Inter", 10), bg=COLORS['card'],
+                                 fg=COLORS['text'], activebackground=COLORS['card'])
+low_stock_check.place(x=130, y=18)
 
 # Treeview for inventory
 columns = ("ID", "Item Name", "Quantity", "Price", "Updated By")
 inventory_tree = ttk.Treeview(inventory_frame.canvas, columns=columns, show='headings', style="Modern.Treeview")
 
 for col in columns:
-    inventory_tree.heading(col, text=col, command=lambda c=col: treeview_sort_column(inventory_tree, c, False))
+    inventory_tree.heading(col, text=col, command=lambda c=col: sort_inventory(c))
     if col == "ID":
         inventory_tree.column(col, width=50, minwidth=50, stretch=tk.NO, anchor=tk.CENTER)
     elif col == "Item Name":
@@ -688,12 +1762,14 @@ for col in columns:
     else:
         inventory_tree.column(col, width=140, anchor=tk.CENTER)
 
-scrollbar = ttk.Scrollbar(inventory_frame.canvas, orient=tk.VERTICAL, command=inventory_tree.yview, style="Modern.Vertical.TScrollbar")
-inventory_tree.configure(yscroll=scrollbar.set)
+scrollbar = ttk.Scrollbar(inventory_frame.canvas, orient=tk.VERTICAL, style="Modern.Vertical.TScrollbar")
+inventory_view = VirtualInventoryView(inventory_tree, scrollbar)
 inventory_tree.pack(side='left', fill='both', expand=True, padx=(5, 0), pady=(50, 10))
 scrollbar.pack(side='right', fill='y', pady=(60, 10))
+inventory_tree.tag_configure('low_stock', background='#fef3c7')
 inventory_tree.bind('<<TreeviewSelect>>', load_selected_item)
 inventory_tree.bind('<Button-3>', show_context_menu)
+inventory_tree.bind('<Control-a>', select_all_items)
 
 # Status bar at the bottom
 status_var = tk.StringVar()
@@ -705,25 +1781,58 @@ context_menu = tk.Menu(root, tearoff=0, bg=COLORS['card'], fg=COLORS['text'],
                       activebackground=COLORS['primary'],
                       activeforeground='white')
 context_menu.add_command(label="Edit Item", command=lambda: load_selected_item(None))
-context_menu.add_command(label="Delete Item", command=delete_item)
+context_menu.add_command(label="Delete Selected", command=delete_item)
+context_menu.add_command(label="Adjust Quantity...", command=adjust_selected_quantities)
+context_menu.add_command(label="Change Price %...", command=change_selected_prices)
+context_menu.add_command(label="Set Low-Stock Threshold...", command=set_selected_thresholds)
+context_menu.add_command(label="Select All Matching (Ctrl+A)", command=select_all_items)
 context_menu.add_separator()
 context_menu.add_command(label="Duplicate Item", command=duplicate_item)
 context_menu.add_command(label="Copy Details", command=copy_item_details)
+context_menu.add_command(label="View Item History", command=show_item_history)
+root.bind('<F12>', show_diagnostics)
 root.option_add('*Menu.borderWidth', '1')
 root.option_add('*Menu.activeBorderWidth', '1')
 root.option_add('*Menu.relief', 'solid')
 root.option_add('*Menu.font', ('Inter', 10))
 
-# Initialize database connection and setup
-conn = get_db_connection()
-c = conn.cursor()
-initialize_database()
-
-# Initial load of inventory list
-display_inventory()
-update_status("Ready.")
+# --- Startup ---
+STARTUP_BUDGET_MS = 1500
+ARCHIVE_DELAY_MS = 30000  # Archive old audit entries once the user has settled in.
+SNAPSHOT_DELAY_MS = 45000
+SNAPSHOT_CHECK_MS = 60 * 60 * 1000  # The app may stay open for days.
+
+def start_application():
+    """Runs once the window has been drawn: migrate the schema if needed, then load the first page."""
+    window_ms = (time.perf_counter() - STARTUP_STARTED) * 1000
+
+    def loaded():
+        startup_seconds = time.perf_counter() - STARTUP_STARTED
+        profiler.record_ui("startup", startup_seconds)  # Shown in the diagnostics panel.
+        log.info("Startup: window shown in %.0f ms, inventory loaded in %.0f ms", window_ms, startup_seconds * 1000)
+        if startup_seconds * 1000 > STARTUP_BUDGET_MS:
+            log.warning("Startup exceeded its %s ms budget", STARTUP_BUDGET_MS)
+        update_status("Ready.")
+        root.after(ARCHIVE_DELAY_MS, run_audit_retention)
+        root.after(SNAPSHOT_DELAY_MS, run_inventory_snapshot)
+
+    def load():
+        update_status("Loading inventory...")
+        low_stock_monitor.refresh()
+        # on_done fires just before the first page is rendered; measure after it is drawn.
+        display_inventory(on_done=lambda: root.after_idle(loaded))
+
+    initialize_database(load)
+
+# Initialize database connection; schema setup and the first query wait for the window
+profiler = QueryProfiler()
+db = open_database()
+store = InventoryStore(db)
+query_runner = AsyncQueryRunner(root, enabled=ASYNC_QUERIES)
+low_stock_monitor = LowStockMonitor(root, low_stock_check)
 
 root.protocol("WM_DELETE_WINDOW", on_closing)
 center_window(root, 1366, 900)
+root.after_idle(start_application)
 
 root.mainloop()
@@ -0,0 +1,288 @@
+"""Benchmarks for the inventory database and reporting hot paths.
+
+Each run builds a synthetic inventory and audit log in a temporary SQLite
+file (same schema and migrations as the app), then times the queries behind
+the UI through the store methods it calls: the first inventory page, keyset
+scrolling and sorting, the scrollbar's anchor scan, search, duplicate-name checks, the audit viewer, the dashboard, item saves (one at a
+time and from concurrent stations), stock movements (one at a time and in
+grouped batches), as-of inventory pages and the Excel report. For every hot path it reports
+throughput, p50/p99 latency and the peak Python memory of one traced call.
+Data generation is seeded, so runs are comparable before and after an index
+or query change:
+
+    python inventory_bench.py --sizes 10000 100000 1000000 --json before.json
+
+With ``--profile`` the store runs under the app's QueryProfiler, and each size
+ends with its slowest statements and any plan that scans or sorts.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from inventory_metrics import QueryProfiler
+from inventory_store import InventoryStore
+
+PAGE_ROWS = 120  # Visible window plus prefetch on both sides, as the virtual view loads it.
+GENERATE_BATCH_SIZE = 50000
+STATIONS = 16  # Concurrent saves, one thread per station.
+ANCHOR_SCAN_ITERATIONS = 10  # Each anchor scan reads the whole view.
+PROFILE_STATEMENTS = 10
+
+ADJECTIVES = ("Sterile", "Disposable", "Nitrile", "Latex", "Adhesive", "Cotton", "Elastic", "Foam",
+              "Silicone", "Surgical", "Pediatric", "Sterilized", "Padded", "Waterproof", "Compact")
+NOUNS = ("Gloves", "Gauze", "Bandage", "Syringe", "Catheter", "Mask", "Swab", "Tape", "Dressing",
+         "Thermometer", "Splint", "Gown", "Pad", "Tubing", "Needle", "Cuff", "Sponge", "Wrap")
+USERS = tuple(f"nurse{i:02d}" for i in range(25))
+ACTIONS = ("Added", "Updated", "Deleted")
+
+
+def item_name(rng, index):
+    # The index keeps names unique ignoring case; the words give FTS realistic postings.
+    return f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {index}"
+
+
+def populate(store, items, audit_per_item, seed):
+    """Insert ``items`` inventory rows and ``items * audit_per_item`` audit rows."""
+    rng = random.Random(seed)
+
+    def insert_items(connection, rows):
+        connection.executemany(
+            "INSERT INTO inventory (item_name, quantity, price, updated_by) VALUES (?, ?, ?, ?)", rows
+        )
+
+    def insert_audit(connection, rows):
+        connection.executemany(
+            "INSERT INTO audit_log (action, item_id, item_name, user, timestamp) VALUES (?, ?, ?, ?, ?)", rows
+        )
+
+    for start in range(0, items, GENERATE_BATCH_SIZE):
+        rows = [(item_name(rng, i), rng.randrange(500), round(rng.uniform(0.5, 250), 2), rng.choice(USERS))
+                for i in range(start, min(start + GENERATE_BATCH_SIZE, items))]
+        store.db.write(insert_items, rows)
+
+    now = datetime.now()
+    audit_rows = int(items * audit_per_item)
+    for start in range(0, audit_rows, GENERATE_BATCH_SIZE):
+        rows = []
+        for _ in range(start, min(start + GENERATE_BATCH_SIZE, audit_rows)):
+            item_id = rng.randrange(1, items + 1)
+            stamp = now - timedelta(seconds=rng.randrange(365 * 86400))
+            rows.append((rng.choice(ACTIONS), item_id, f"Item {item_id}", rng.choice(USERS),
+                         stamp.strftime("%Y-%m-%d %H:%M:%S")))
+        store.db.write(insert_audit, rows)
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def measure(name, size, func, iterations):
+    """Time ``func(i)`` for ``i in range(iterations)``, then trace one extra call for peak memory."""
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        call_started = time.perf_counter()
+        func(i)
+        latencies.append((time.perf_counter() - call_started) * 1000)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    func(iterations)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "benchmark": name,
+        "rows": size,
+        "iterations": iterations,
+        "ops_per_sec": iterations / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50),
+        "p99_ms": percentile(latencies, 0.99),
+        "peak_kib": peak // 1024,
+    }
+
+
+def hot_paths(store, items, workdir, seed):
+    """Yield ``(name, func, max_iterations)`` for every benchmarked path (None: no cap)."""
+    rng = random.Random(seed + 1)
+    ids = [rng.randrange(1, items + 1) for _ in range(1000)]
+    quantities = [rng.randrange(500) for _ in range(1000)]
+    words = [rng.choice(ADJECTIVES + NOUNS)[:rng.randint(2, 6)] for _ in range(1000)]
+    # Half existing names (in a different case), half misses.
+    names = [store.get_item(item_id)[1].upper() for item_id in ids[:500]]
+    names += [f"Missing Item {i}" for i in range(500)]
+
+    store.take_snapshot()
+    today = store.db.query_one("SELECT date('now')")[0]  # The audit log's (UTC) clock.
+
+    def pick(values, i):
+        return values[i % len(values)]
+
+    # The virtual view's queries: a count and a page per filter change, a page per scroll.
+    def first_page(i):
+        store.count_items()
+        store.page(limit=PAGE_ROWS)
+
+    def keyset_page(i):
+        store.page(key=(pick(ids, i),), limit=PAGE_ROWS)
+
+    def sorted_page(i):
+        store.page(sort="quantity", key=(pick(quantities, i), pick(ids, i)), limit=PAGE_ROWS)
+
+    def anchor_scan(i):
+        store.anchors(sort="quantity")
+
+    def prefix_search(i):
+        store.count_items(pick(words, i))
+        store.page(text=pick(words, i), limit=PAGE_ROWS)
+
+    def ranked_search(i):
+        store.search(pick(words, i), ranked=True)
+
+    def duplicate_check(i):
+        with store.db.reader() as connection:
+            store._is_duplicate_name(connection, pick(names, i))
+
+    def audit_first_page(i):
+        store.audit_page()
+
+    def audit_by_user(i):
+        store.audit_page({"user": pick(USERS, i)})
+
+    def item_history(i):
+        store.audit_page({"item_id": pick(ids, i)})
+
+    def dashboard(i):
+        store.dashboard()
+
+    def save_item(i):
+        store.save_item(f"Benchmark Item {seed}-{time.perf_counter_ns()}", i % 500, 9.99, "bench")
+
+    stations = ThreadPoolExecutor(max_workers=STATIONS, thread_name_prefix="bench-station")
+
+    def concurrent_saves(i):
+        # Every station saves at once; the writer group-commits what queues up.
+        futures = [stations.submit(store.save_item, names[j], pick(quantities, j), 9.99, "bench", item_id=ids[j])
+                   for j in ((i * STATIONS + k) % 500 for k in range(STATIONS))]
+        for future in futures:
+            future.result()
+
+    def stock_movement(i):
+        store.move_stock(pick(ids, i), 1, "receipt", "bench")
+
+    def movement_batch(i):
+        # A scanner feed's group commit: 1,000 scans in one transaction.
+        store.record_movements([(pick(ids, i * 1000 + j), (-1, 1)[j % 2], "scan", None, "bench")
+                                for j in range(1000)])
+
+    def as_of_page(i):
+        # Snapshot plus everything the other benchmarks changed since.
+        store.inventory_as_of(today, after_id=pick(ids, i), limit=PAGE_ROWS)
+
+    def report(i):
+        store.export_report(os.path.join(workdir, f"report_{i}.xlsx"))
+
+    try:
+        yield "first_page", first_page, None
+        yield "keyset_page", keyset_page, None
+        yield "sorted_page", sorted_page, None
+        yield "anchor_scan", anchor_scan, ANCHOR_SCAN_ITERATIONS
+        yield "prefix_search", prefix_search, None
+        if store.fts_enabled:
+            yield "ranked_search", ranked_search, None
+        yield "duplicate_check", duplicate_check, None
+        yield "audit_first_page", audit_first_page, None
+        yield "audit_by_user", audit_by_user, None
+        yield "item_history", item_history, None
+        yield "dashboard", dashboard, None
+        yield "save_item", save_item, None
+        yield "concurrent_saves", concurrent_saves, None
+        yield "stock_movement", stock_movement, None
+        yield "movement_batch", movement_batch, None
+        yield "as_of_page", as_of_page, None
+        yield "report", report, 1
+    finally:
+        stations.shutdown()
+
+def print_profile(profiler):
+    summary = profiler.summary()
+    print(f"Profiler: {summary['queries']:,} queries, {summary['statements']:,} statements, "
+          f"{summary['query_ms']:,.0f} ms, {summary['warnings']} plan warnings")
+    for stats in profiler.statement_stats()[:PROFILE_STATEMENTS]:
+        print(f"{stats['total_ms']:>10,.0f} ms{stats['calls']:>8,} calls{stats['avg_ms']:>10.2f} ms avg  "
+              f"{stats['sql'][:100]}")
+        for warning in stats["warnings"]:
+            print(f"{'':>14}plan: {warning}")
+
+
+def run(sizes, iterations, audit_per_item, seed, report_limit, profile=False):
+    results = []
+    for size in sizes:
+        workdir = tempfile.mkdtemp(prefix="inventory_bench_")
+        profiler = QueryProfiler() if profile else None
+        store = InventoryStore.open(os.path.join(workdir, "bench.db"), profiler=profiler)
+        try:
+            started = time.perf_counter()
+            populate(store, size, audit_per_item, seed)
+            print(f"\nGenerated {size:,} items and {int(size * audit_per_item):,} audit rows "
+                  f"in {time.perf_counter() - started:.1f}s")
+            if profiler is not None:
+                profiler.reset()  # Profile the hot paths, not the data generation.
+            print(f"{'benchmark':<18}{'rows':>11}{'ops/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'peak KiB':>11}")
+            for name, func, max_iterations in hot_paths(store, size, workdir, seed):
+                if name == "report" and size > report_limit:
+                    continue
+                result = measure(name, size, func, min(iterations, max_iterations or iterations))
+                results.append(result)
+                print(f"{name:<18}{size:>11,}{result['ops_per_sec']:>12,.1f}{result['p50_ms']:>10.2f}"
+                      f"{result['p99_ms']:>10.2f}{result['peak_kib']:>11,}")
+            print(f"Writer: {store.db.write_tasks:,} write tasks in {store.db.commits:,} commits")
+            if profiler is not None:
+                print_profile(profiler)
+        finally:
+            store.close()
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000],
+                        help="inventory sizes to generate (default: 10000 100000; up to 5000000)")
+    parser.add_argument("--iterations", type=int, default=200, help="timed calls per benchmark")
+    parser.add_argument("--audit-per-item", type=float, default=3.0, help="audit rows generated per item")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--report-limit", type=int, default=100000,
+                        help="skip the Excel report benchmark above this many items (default: 100000; "
+                             "the traced memory run of a report is several times slower than the timed one)")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    parser.add_argument("--profile", action="store_true",
+                        help="run under the query profiler and print the slowest statements and plan warnings "
+                             "(adds the profiler's overhead to the timings)")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.iterations, args.audit_per_item, args.seed, args.report_limit, args.profile)
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == "darwin":
+            peak //= 1024  # macOS reports bytes, Linux KiB.
+        print(f"\nPeak process RSS: {peak:,} KiB")
+    except ImportError:
+        pass  # Not available on Windows.
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"python": sys.version, "seed": args.seed, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Inventory rules shared by the desktop UI and the bulk import pipeline."""
+import json
+import math
+import string
+
+MAX_NAME_LENGTH = 100
+MAX_USER_LENGTH = 50
+MAX_REASON_LENGTH = 50
+MAX_REFERENCE_LENGTH = 100
+MAX_PRICE = 1_000_000_000
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+class ValidationError(ValueError):
+    """An item failed one of the validation rules; the message is user-facing."""
+
+
+class DuplicateNameError(ValidationError):
+    """Another item already has this name (names are unique ignoring case)."""
+
+    def __init__(self, name):
+        super().__init__(f"Item name '{name}' already exists.")
+        self.name = name
+
+
+class ItemNotFoundError(ValidationError):
+    """The item was deleted (possibly from another station) before the write reached it."""
+
+    def __init__(self, item_id):
+        super().__init__(f"Item ID {item_id} no longer exists.")
+        self.item_id = item_id
+
+
+class EditConflictError(ValidationError):
+    """The item changed since the editor loaded it; ``current`` is the item as it is now."""
+
+    def __init__(self, current):
+        super().__init__(f"Item ID {current[0]} was changed by {current[4]} since you loaded it.")
+        self.current = current
+
+
+def validate_item(name, quantity, price, user):
+    """Apply the item rules and return ``(name, quantity, price, user)`` ready to store.
+
+    Inputs are the raw form/cell strings. Raises ValidationError with the
+    same messages the item form shows.
+    """
+    # Non-printable characters go first, so a name of only control characters counts as empty.
+    name = ''.join(ch for ch in name if ch.isprintable()).strip()
+    quantity = quantity.strip()
+    price = price.strip()
+    user = ''.join(ch for ch in user if ch.isprintable()).strip()
+
+    if len(name) > MAX_NAME_LENGTH:
+        raise ValidationError(f"Item name must be {MAX_NAME_LENGTH} characters or less!")
+    if len(user) > MAX_USER_LENGTH:
+        raise ValidationError(f"Updated By must be {MAX_USER_LENGTH} characters or less!")
+
+    if not (name and quantity and price and user):
+        raise ValidationError("All fields are required!")
+
+    try:
+        quantity_int = int(quantity)
+        price_float = float(price)
+    except ValueError:
+        raise ValidationError("Quantity must be an integer, and Price must be a number.")
+    if not math.isfinite(price_float):
+        raise ValidationError("Quantity must be an integer, and Price must be a number.")
+    if quantity_int < 0 or price_float < 0:
+        raise ValidationError("Quantity and Price must be non-negative.")
+    if price_float > MAX_PRICE:
+        raise ValidationError(f"Price must be {MAX_PRICE:,} or less!")
+
+    return name, quantity_int, price_float, user
+
+
+def validate_user(user):
+    """Apply the Updated By rules to a raw string on its own (used by batch updates)."""
+    user = ''.join(ch for ch in user if ch.isprintable()).strip()
+    if len(user) > MAX_USER_LENGTH:
+        raise ValidationError(f"Updated By must be {MAX_USER_LENGTH} characters or less!")
+    if not user:
+        raise ValidationError("Updated By is required!")
+    return user
+
+
+def as_integer(value):
+    """``int(value)`` for whole numbers and digit strings; raises rather than truncating 1.9 or taking True."""
+    if isinstance(value, bool):
+        raise TypeError(value)
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(value)
+    if not isinstance(value, (int, float, str)):
+        raise TypeError(value)
+    return int(value)
+
+
+def validate_movement(item_id, delta, reason, reference, user):
+    """Apply the stock movement rules and return ``(item_id, delta, reason, reference, user)`` ready to store.
+
+    ``delta`` is the signed quantity change (receipts positive, picks
+    negative); ``reference`` (a PO number, scan id, ...) is optional.
+    """
+    try:
+        item_id = as_integer(item_id)
+        delta = as_integer(delta)
+    except (TypeError, ValueError):
+        raise ValidationError("Item ID and quantity change must be integers.")
+    if delta == 0:
+        raise ValidationError("Quantity change must not be zero.")
+    reason = ''.join(ch for ch in str(reason or '').strip() if ch.isprintable())
+    if not reason:
+        raise ValidationError("Movement reason is required!")
+    if len(reason) > MAX_REASON_LENGTH:
+        raise ValidationError(f"Movement reason must be {MAX_REASON_LENGTH} characters or less!")
+    reference = ''.join(ch for ch in str(reference or '').strip() if ch.isprintable()) or None
+    if reference and len(reference) > MAX_REFERENCE_LENGTH:
+        raise ValidationError(f"Movement reference must be {MAX_REFERENCE_LENGTH} characters or less!")
+    return item_id, delta, reason, reference, validate_user(str(user or ''))
+
+
+def audit_changes(before=None, after=None):
+    """Encode what a write changed as compact JSON: ``{"field": [old, new], ...}``.
+
+    ``before`` and ``after`` map field names to values; leave one out for an
+    added or deleted item. Unchanged fields are dropped, and None is returned
+    when nothing changed.
+    """
+    before, after = before or {}, after or {}
+    changes = {field: [before.get(field), after.get(field)] for field in {**before, **after}
+               if before.get(field) != after.get(field)}
+    return json.dumps(changes, separators=(",", ":")) if changes else None
+
+
+def format_changes(changes):
+    """Render an audit ``changes`` value for display, e.g. ``quantity 40 → 35, price 3.5 → 3.75``."""
+    if not changes:
+        return ""
+    parts = []
+    for field, (old, new) in json.loads(changes).items():
+        if old is None:
+            parts.append(f"{field} {new}")
+        elif new is None:
+            parts.append(f"{field} was {old}")
+        else:
+            parts.append(f"{field} {old} → {new}")
+    return ", ".join(parts)
+
+
+def fold_name(name):
+    """Case-fold a name the way SQLite's NOCASE collation does (ASCII letters only)."""
+    return name.translate(_ASCII_LOWER)
@@ -0,0 +1,259 @@
+"""Thread-safe SQLite access for the Inventory Management System.
+
+All writes go through one writer thread that owns the only writable
+connection; reads use a small pool of read-only connections. With WAL
+journaling, readers (UI queries, searches, long report exports) never block
+the writer and never see a half-finished transaction. ``submit_read`` and
+``submit_write`` return futures, so callers such as the Tk UI never have to
+block on a query. Extra database files (such as the audit archive) can be
+attached to every connection under a schema name with ``attach``.
+
+The writer group-commits: write tasks that queue up while a transaction is
+being committed run together in the next one, each inside its own savepoint,
+so a failing task rolls back only its own changes. The writer runs with
+synchronous=FULL, so a task's future resolves only after the COMMIT that made
+it durable, power loss included; under concurrent editing many saves (with
+their audit entries) share one commit, and its fsync, instead of paying for
+one each.
+"""
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Applied to every connection at open time; cache_size is in KiB when negative.
+CONNECTION_PRAGMAS = {
+    "synchronous": "NORMAL",
+    "cache_size": -64000,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+# Applied on top for the writer, to the main and every attached database. In
+# WAL mode synchronous=NORMAL does not fsync at COMMIT, so a write the UI has
+# already confirmed could be lost on power failure; FULL syncs the WAL on every
+# commit. The read-only connections never commit and keep NORMAL.
+WRITER_PRAGMAS = {
+    "synchronous": "FULL",
+}
+WRITE_GROUP_LIMIT = 64  # most write tasks committed together in one transaction
+_NO_TASK = object()
+
+
+class Database:
+    """Connection manager: a pool of reader connections plus a single writer queue."""
+
+    def __init__(self, path, read_pool_size=4, timeout=30.0, pragmas=None, profiler=None, attach=None,
+                 write_group_limit=WRITE_GROUP_LIMIT):
+        self.path = path
+        self.write_group_limit = write_group_limit
+        self.write_tasks = 0  # committed write tasks ...
+        self.commits = 0  # ... and the transactions they took
+        self.attach = dict(attach or {})  # schema name -> database path
+        self.timeout = timeout
+        self.profiler = profiler
+        self.pragmas = dict(CONNECTION_PRAGMAS, **(pragmas or {}))
+        self.writer_pragmas = {name: value for name, value in WRITER_PRAGMAS.items() if name not in (pragmas or {})}
+        self._idle_readers = queue.LifoQueue()
+        self._reader_slots = threading.BoundedSemaphore(read_pool_size)
+        self._all_readers = []
+        self._readers_lock = threading.Lock()
+        self._closed = False
+        self._read_executor = ThreadPoolExecutor(max_workers=read_pool_size,
+                                                 thread_name_prefix="inventory-db-reader")
+
+        self._write_queue = queue.Queue()
+        ready = Future()
+        self._writer = threading.Thread(target=self._writer_loop, args=(ready,),
+                                        name="inventory-db-writer", daemon=True)
+        self._writer.start()
+        ready.result()  # Surface connection errors to the caller.
+
+    def _connect(self, read_only=False):
+        # Autocommit mode: transactions are started explicitly by the writer.
+        options = {}
+        if self.profiler is not None:
+            from inventory_metrics import ProfiledConnection
+            options["factory"] = ProfiledConnection
+        connection = sqlite3.connect(self.path, timeout=self.timeout,
+                                     isolation_level=None, check_same_thread=False, **options)
+        if self.profiler is not None:
+            connection.profiler = self.profiler
+        connection.execute(f"PRAGMA busy_timeout = {int(self.timeout * 1000)}")
+        for name, attach_path in self.attach.items():
+            connection.execute(f"ATTACH DATABASE ? AS {name}", (attach_path,))
+        if read_only:
+            connection.execute("PRAGMA query_only = ON")
+        else:
+            # auto_vacuum must be chosen before the file is first written (here,
+            # by the switch to WAL); on an existing file it waits for a VACUUM.
+            connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            connection.execute("PRAGMA journal_mode = WAL")
+        for name, value in self.pragmas.items():
+            connection.execute(f"PRAGMA {name} = {value}")
+        if not read_only:
+            for schema in ["main"] + list(self.attach):
+                for name, value in self.writer_pragmas.items():
+                    connection.execute(f"PRAGMA {schema}.{name} = {value}")
+        return connection
+
+    # --- Writes ---
+    def _writer_loop(self, ready):
+        try:
+            connection = self._connect()
+        except sqlite3.Error as e:
+            ready.set_exception(e)
+            return
+        ready.set_result(None)
+
+        pending = _NO_TASK
+        while True:
+            task = self._write_queue.get() if pending is _NO_TASK else pending
+            pending = _NO_TASK
+            if task is None:
+                break
+            if not task[4]:
+                self._run_outside_transaction(connection, task)
+                continue
+            # Take whatever else queued meanwhile; never wait for more.
+            group = [task]
+            while len(group) < self.write_group_limit:
+                try:
+                    task = self._write_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if task is None or not task[4]:
+                    pending = task
+                    break
+                group.append(task)
+            self._commit_group(connection, group)
+        connection.close()
+
+    def _run_outside_transaction(self, connection, task):
+        future, func, args, kwargs, _ = task
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = func(connection, *args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    def _commit_group(self, connection, group):
+        group = [task for task in group if task[0].set_running_or_notify_cancel()]
+        if not group:
+            return
+        savepoints = len(group) > 1
+        outcomes = []
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                for future, func, args, kwargs, _ in group:
+                    if savepoints:
+                        connection.execute("SAVEPOINT write_task")
+                    try:
+                        result = func(connection, *args, **kwargs)
+                    except Exception as e:
+                        if not savepoints:
+                            raise
+                        connection.execute("ROLLBACK TO write_task")
+                        connection.execute("RELEASE write_task")
+                        outcomes.append((future, e, False))
+                    else:
+                        if savepoints:
+                            connection.execute("RELEASE write_task")
+                        outcomes.append((future, result, True))
+                connection.execute("COMMIT")
+            except BaseException:
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                raise
+        except BaseException as e:
+            # Nothing in the group was committed, including tasks that succeeded.
+            for future, *_ in group:
+                future.set_exception(e)
+            return
+        self.write_tasks += sum(1 for *_, succeeded in outcomes if succeeded)
+        self.commits += 1
+        for future, value, succeeded in outcomes:
+            if succeeded:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def submit_write(self, func, *args, **kwargs):
+        """Queue ``func(connection, *args, **kwargs)`` to run in a write transaction.
+
+        Returns a Future that resolves once the transaction has committed.
+        ``func``'s changes are kept if it returns and rolled back if it
+        raises; other tasks committed in the same transaction are unaffected.
+        """
+        return self._submit_writer(func, args, kwargs, True)
+
+    def write(self, func, *args, **kwargs):
+        """Run ``func`` on the writer thread and wait for its result."""
+        return self.submit_write(func, *args, **kwargs).result()
+
+    def maintain(self, func, *args, **kwargs):
+        """Run ``func`` on the writer connection outside any transaction and wait for its result.
+
+        For statements SQLite refuses inside a transaction, such as VACUUM or
+        changing ``auto_vacuum``. Other writes wait in the queue meanwhile.
+        """
+        return self._submit_writer(func, args, kwargs, False).result()
+
+    def _submit_writer(self, func, args, kwargs, transaction):
+        if self._closed:
+            raise sqlite3.ProgrammingError("Cannot write to a closed database.")
+        future = Future()
+        self._write_queue.put((future, func, args, kwargs, transaction))
+        return future
+
+    # --- Reads ---
+    @contextmanager
+    def reader(self):
+        """Borrow a read-only connection from the pool for the duration of the block."""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Cannot read from a closed database.")
+        self._reader_slots.acquire()
+        try:
+            try:
+                connection = self._idle_readers.get_nowait()
+            except queue.Empty:
+                connection = self._connect(read_only=True)
+                with self._readers_lock:
+                    self._all_readers.append(connection)
+            try:
+                yield connection
+            finally:
+                self._idle_readers.put(connection)
+        finally:
+            self._reader_slots.release()
+
+    def submit_read(self, func, *args, **kwargs):
+        """Run ``func(connection, *args, **kwargs)`` on the read pool; returns a Future."""
+        def run():
+            with self.reader() as connection:
+                return func(connection, *args, **kwargs)
+        return self._read_executor.submit(run)
+
+    def query(self, sql, params=()):
+        with self.reader() as connection:
+            return connection.execute(sql, params).fetchall()
+
+    def query_one(self, sql, params=()):
+        with self.reader() as connection:
+            return connection.execute(sql, params).fetchone()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._read_executor.shutdown(wait=False)
+        self._write_queue.put(None)
+        self._writer.join()
+        with self._readers_lock:
+            for connection in self._all_readers:
+                connection.close()
+            self._all_readers.clear()
@@ -0,0 +1,148 @@
+"""Bulk import of supplier catalogues (CSV or XLSX) into the inventory.
+
+Rows are streamed from the file, validated with the same rules as the item
+form, de-duplicated against the file itself and against the NOCASE unique
+name index, and written in batched transactions (one ``executemany`` insert
+plus one audit insert per batch).
+"""
+import csv
+import os
+
+from inventory_core import DuplicateNameError, ValidationError, audit_changes, fold_name, validate_item
+
+IMPORT_BATCH_SIZE = 5000
+IMPORT_FIELDS = ("Item Name", "Quantity", "Price", "Updated By")
+
+# Accepted spellings of each header, compared case-insensitively.
+_HEADER_ALIASES = {
+    "item name": "Item Name", "item_name": "Item Name", "name": "Item Name",
+    "quantity": "Quantity", "qty": "Quantity",
+    "price": "Price",
+    "updated by": "Updated By", "updated_by": "Updated By", "user": "Updated By",
+}
+
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.rejects = []  # (line number, reason, raw values)
+
+    @property
+    def rejected(self):
+        return len(self.rejects)
+
+
+def _cell_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _map_header(header):
+    mapping = {}
+    for index, title in enumerate(header):
+        field = _HEADER_ALIASES.get(_cell_text(title).strip().lower())
+        if field and field not in mapping:
+            mapping[field] = index
+    missing = [field for field in IMPORT_FIELDS if field not in mapping]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+    return [mapping[field] for field in IMPORT_FIELDS]
+
+
+def read_rows(path):
+    """Yield ``(line_number, [name, quantity, price, user])`` from a CSV or XLSX file."""
+    if os.path.splitext(path)[1].lower() in (".xlsx", ".xlsm"):
+        import openpyxl
+
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            yield from _mapped_rows(rows)
+        finally:
+            wb.close()
+    else:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            yield from _mapped_rows(csv.reader(f))
+
+
+def _mapped_rows(rows):
+    rows = iter(rows)
+    columns = _map_header(next(rows, ()))
+    for line_number, row in enumerate(rows, start=2):
+        if not any(_cell_text(value).strip() for value in row):
+            continue  # Skip blank lines.
+        yield line_number, [_cell_text(row[i]) if i < len(row) else "" for i in columns]
+
+
+def _insert_batch(connection, batch, seen):
+    rows, duplicates = [], []
+    for line_number, item, raw in batch:
+        folded = fold_name(item[0])
+        exists = folded in seen or connection.execute(
+            "SELECT 1 FROM inventory WHERE item_name = ? COLLATE NOCASE LIMIT 1", (item[0],)
+        ).fetchone()
+        if exists:
+            duplicates.append((line_number, str(DuplicateNameError(item[0])), raw))
+            continue
+        seen.add(folded)
+        rows.append(item)
+
+    if rows:
+        # AUTOINCREMENT ids only grow and the writer is single-threaded, so
+        # every id above the current maximum belongs to this batch.
+        first_id = connection.execute("SELECT COALESCE(MAX(id), 0) FROM inventory").fetchone()[0]
+        connection.executemany(
+            "INSERT INTO inventory (item_name, quantity, price, updated_by) VALUES (?, ?, ?, ?)", rows
+        )
+        added = connection.execute(
+            "SELECT id, item_name, updated_by, quantity, price FROM inventory WHERE id > ? ORDER BY id", (first_id,)
+        ).fetchall()
+        connection.executemany(
+            "INSERT INTO audit_log (action, item_id, item_name, user, changes) VALUES ('Added', ?, ?, ?, ?)",
+            [(item_id, name, user, audit_changes(after={"item_name": name, "quantity": quantity, "price": price}))
+             for item_id, name, user, quantity, price in added]
+        )
+    return len(rows), duplicates
+
+
+def import_items(db, rows, batch_size=IMPORT_BATCH_SIZE, on_progress=None):
+    """Validate and insert ``rows`` (as produced by ``read_rows``) through ``db``'s writer.
+
+    Each batch is its own transaction, so UI writes can interleave with a
+    long import. ``on_progress(imported, rejected)`` is called after every batch.
+    """
+    result = ImportResult()
+    seen = set()
+    batch = []
+
+    def flush():
+        imported, duplicates = db.write(_insert_batch, batch, seen)
+        result.imported += imported
+        result.rejects.extend(duplicates)
+        batch.clear()
+        if on_progress is not None:
+            on_progress(result.imported, result.rejected)
+
+    for line_number, raw in rows:
+        try:
+            item = validate_item(*raw)
+        except ValidationError as e:
+            result.rejects.append((line_number, str(e), raw))
+            continue
+        batch.append((line_number, item, raw))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return result
+
+
+def write_rejects(path, rejects):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(("Line", "Reason") + IMPORT_FIELDS)
+        for line_number, reason, raw in sorted(rejects):
+            writer.writerow([line_number, reason] + list(raw))
@@ -0,0 +1,201 @@
+"""Load test for the inventory HTTP server.
+
+Starts ``inventory_server.py`` in a subprocess against a seeded temporary
+database (or targets a running server with ``--url``), then runs
+``--clients`` concurrent clients, each on its own keep-alive connection, for
+``--duration`` seconds. The request mix imitates stockroom stations: mostly
+searches, item lookups and scrolling, with some saves, batches of stock
+movement scans, the low-stock list and the dashboard. Reports overall requests/sec and per-endpoint p50/p99
+latency:
+
+    python inventory_loadtest.py --items 100000 --clients 1 8 32 --duration 10
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+from inventory_bench import ADJECTIVES, NOUNS, percentile, populate
+from inventory_store import InventoryStore
+
+# (weight, name, method, path factory, body factory); factories take (rng, state).
+MIX = [
+    (25, "search", "GET", lambda rng, s: f"/items?q={rng.choice(ADJECTIVES + NOUNS)[:4]}&limit=50", None),
+    (25, "get_item", "GET", lambda rng, s: f"/items/{rng.randrange(1, s['items'] + 1)}", None),
+    (15, "page", "GET", lambda rng, s: f"/items?after_id={rng.randrange(s['items'])}&limit=100", None),
+    # Read-modify-write: the PUT body comes from a fresh GET (see Client.update_item).
+    (8, "update_item", "PUT", lambda rng, s: f"/items/{rng.randrange(1, s['items'] + 1)}", None),
+    (7, "add_item", "POST", lambda rng, s: "/items",
+     lambda rng, s: {"item_name": f"Load Item {s['client']}-{time.perf_counter_ns()}",
+                     "quantity": rng.randrange(100), "price": round(rng.uniform(1, 99), 2),
+                     "updated_by": f"station{s['client']:02d}"}),
+    # A scanner station posting the scans it buffered since its last request.
+    (5, "movements", "POST", lambda rng, s: "/movements",
+     lambda rng, s: {"movements": [{"item_id": rng.randrange(1, s['items'] + 1), "delta": rng.choice((-2, -1, 1, 3)),
+                                    "reason": "scan", "updated_by": f"station{s['client']:02d}"}
+                                   for _ in range(rng.randint(1, 20))]}),
+    (5, "low_stock", "GET", lambda rng, s: "/low-stock?limit=50", None),
+    (5, "audit", "GET", lambda rng, s: "/audit?limit=50", None),
+    (5, "dashboard", "GET", lambda rng, s: "/dashboard", None),
+]
+OK_STATUSES = (200, 201, 404, 409)  # 404/409: another client deleted or renamed the item first.
+
+
+class Client(threading.Thread):
+    def __init__(self, index, host, port, token, items, deadline, seed):
+        super().__init__(daemon=True)
+        self.rng = random.Random(seed + index)
+        self.state = {"client": index, "items": items}
+        self.host, self.port, self.token = host, port, token
+        self.deadline = deadline
+        self.latencies = {}
+        self.errors = 0
+        self.weights = [entry[0] for entry in MIX]
+
+    def request(self, connection, method, path, body=None):
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        response = connection.getresponse()
+        return response.status, response.read()
+
+    def update_item(self, connection, path):
+        status, payload = self.request(connection, "GET", path)
+        if status != 200:
+            return status
+        item = json.loads(payload)
+        item["quantity"] = max(0, item["quantity"] + self.rng.randint(-5, 5))
+        item["updated_by"] = f"station{self.state['client']:02d}"
+        return self.request(connection, "PUT", path, item)[0]
+
+    def run(self):
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        while time.perf_counter() < self.deadline:
+            _, name, method, make_path, make_body = self.rng.choices(MIX, self.weights)[0]
+            path = make_path(self.rng, self.state)
+            started = time.perf_counter()
+            try:
+                if name == "update_item":
+                    status = self.update_item(connection, path)
+                else:
+                    status = self.request(connection, method, path,
+                                          make_body(self.rng, self.state) if make_body else None)[0]
+            except (OSError, http.client.HTTPException):
+                self.errors += 1
+                connection.close()
+                connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+                continue
+            if status not in OK_STATUSES:
+                self.errors += 1
+            self.latencies.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+        connection.close()
+
+
+def run_load(host, port, token, items, clients, duration, seed):
+    deadline = time.perf_counter() + duration
+    workers = [Client(i, host, port, token, items, deadline, seed) for i in range(clients)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = {}
+    for worker in workers:
+        for name, values in worker.latencies.items():
+            latencies.setdefault(name, []).extend(values)
+    total = sum(len(values) for values in latencies.values())
+    result = {"clients": clients, "requests": total, "errors": sum(w.errors for w in workers),
+              "requests_per_sec": total / elapsed, "endpoints": {}}
+    for name, values in sorted(latencies.items()):
+        values.sort()
+        result["endpoints"][name] = {"requests": len(values), "p50_ms": percentile(values, 0.50),
+                                     "p99_ms": percentile(values, 0.99)}
+    return result
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(db_path, port, workers):
+    server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                            "inventory_server.py"),
+                               "--db", db_path, "--port", str(port), "--workers", str(workers), "--quiet"])
+    for _ in range(100):
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/health")
+            ready = connection.getresponse().status == 200
+            connection.close()
+            if ready:
+                return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("The server did not start.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="test a running server instead (e.g. http://host:8765); "
+                                      "it must hold at least --items items")
+    parser.add_argument("--token", default=os.environ.get("INVENTORY_TOKEN"))
+    parser.add_argument("--items", type=int, default=20000, help="items to seed (default: 20000)")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16], help="concurrent clients per run")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--workers", type=int, default=16, help="minimum server request threads (spawned server only)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    workdir = server = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        workdir = tempfile.mkdtemp(prefix="inventory_load_")
+        db_path = os.path.join(workdir, "load.db")
+        store = InventoryStore.open(db_path)
+        populate(store, args.items, 1.0, args.seed)
+        store.close()
+        host, port = "127.0.0.1", free_port()
+        # Every keep-alive client holds a server worker, so give each one a thread.
+        server = start_server(db_path, port, max(args.workers, max(args.clients)))
+
+    results = []
+    try:
+        print(f"{'clients':>8}{'requests':>10}{'req/s':>10}{'errors':>8}   endpoint p50/p99 ms")
+        for clients in args.clients:
+            result = run_load(host, port, args.token, args.items, clients, args.duration, args.seed)
+            results.append(result)
+            detail = "  ".join(f"{name} {stats['p50_ms']:.1f}/{stats['p99_ms']:.1f}"
+                               for name, stats in result["endpoints"].items())
+            print(f"{clients:>8}{result['requests']:>10,}{result['requests_per_sec']:>10,.0f}"
+                  f"{result['errors']:>8}   {detail}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"python": sys.version, "items": args.items, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""Query profiling and UI timing for the Inventory Management System.
+
+A ``QueryProfiler`` passed to ``Database(profiler=...)`` makes every
+connection a ``ProfiledConnection``. Every statement the app issues is then
+timed from ``execute`` through the last fetch, with the number of rows
+returned (or changed). The first time a statement text is seen, its
+``EXPLAIN QUERY PLAN`` is checked for full table scans and temporary sort
+B-trees, which usually mean a missing index. UI code reports its own timings
+(such as Treeview population) with ``record_ui``. The profiler keeps
+per-statement aggregates plus a bounded event history, which ``export``
+writes as a JSON Lines metrics log.
+"""
+import itertools
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+ITER_BATCH_ROWS = 256  # rows read (and timed) at a time when a profiled cursor is iterated
+
+
+class StatementStats:
+    __slots__ = ("sql", "calls", "seconds", "max_seconds", "rows")
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+
+
+class QueryEvent:
+    """One executed statement; fetches keep adding to it until the cursor is drained."""
+    __slots__ = ("started", "stats", "seconds", "rows", "thread")
+
+    def __init__(self, stats, seconds, rows):
+        self.started = time.time()
+        self.stats = stats
+        self.seconds = seconds
+        self.rows = rows
+        self.thread = threading.current_thread().name
+
+
+def plan_warnings(plan_details):
+    """Return the plan steps that read a whole table or sort without an index."""
+    warnings = []
+    for detail in plan_details:
+        if detail.startswith("SCAN ") and " USING " not in detail and "VIRTUAL TABLE" not in detail \
+                and "CONSTANT ROW" not in detail and not detail.startswith("SCAN sqlite_"):
+            warnings.append(detail)
+        elif detail.startswith("USE TEMP B-TREE"):
+            warnings.append(detail)
+    return warnings
+
+
+class QueryProfiler:
+    """Thread-safe collector of statement timings, plan warnings and UI timings."""
+
+    def __init__(self, history=5000):
+        self._lock = threading.Lock()
+        self._normalized = {}
+        self._statements = {}
+        self._planned = set()
+        self.warnings = {}  # normalized SQL -> plan steps that scan or sort
+        self.events = deque(maxlen=history)
+        self.ui = {}  # name -> [calls, total seconds, max seconds, last seconds, rows]
+        self.ui_events = deque(maxlen=history)
+
+    def _normalize(self, sql):
+        normalized = self._normalized.get(sql)
+        if normalized is None:
+            normalized = self._normalized[sql] = " ".join(sql.split())
+        return normalized
+
+    # --- Statements ---
+    def check_plan(self, connection, sql, parameters):
+        """Run EXPLAIN QUERY PLAN the first time a statement text is seen."""
+        with self._lock:
+            normalized = self._normalize(sql)
+            if normalized in self._planned:
+                return
+            self._planned.add(normalized)
+        if not normalized.upper().startswith(_EXPLAINABLE):
+            return
+        try:
+            plan = connection.cursor(sqlite3.Cursor).execute(
+                "EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+        except sqlite3.Error:
+            return  # The statement itself will report the problem.
+        warnings = plan_warnings([row[-1] for row in plan])
+        if warnings:
+            with self._lock:
+                self.warnings[normalized] = warnings
+
+    def record(self, sql, seconds, rows):
+        with self._lock:
+            normalized = self._normalize(sql)
+            stats = self._statements.get(normalized)
+            if stats is None:
+                stats = self._statements[normalized] = StatementStats(normalized)
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.rows += rows
+            event = QueryEvent(stats, seconds, rows)
+            self.events.append(event)
+            return event
+
+    def add_rows(self, event, rows, seconds):
+        with self._lock:
+            stats = event.stats
+            event.rows += rows
+            event.seconds += seconds
+            stats.rows += rows
+            stats.seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, event.seconds)
+
+    # --- UI ---
+    def record_ui(self, name, seconds, rows=0):
+        with self._lock:
+            entry = self.ui.setdefault(name, [0, 0.0, 0.0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            entry[3] = seconds
+            entry[4] += rows
+            self.ui_events.append((time.time(), name, seconds, rows))
+
+    # --- Reporting ---
+    def statement_stats(self):
+        """Per-statement aggregates as dicts, slowest total first."""
+        with self._lock:
+            stats = sorted(self._statements.values(), key=lambda s: s.seconds, reverse=True)
+            return [{"sql": s.sql, "calls": s.calls, "total_ms": s.seconds * 1000,
+                     "avg_ms": s.seconds * 1000 / s.calls, "max_ms": s.max_seconds * 1000,
+                     "rows": s.rows, "warnings": self.warnings.get(s.sql, [])} for s in stats]
+
+    def ui_stats(self):
+        with self._lock:
+            return [{"name": name, "calls": calls, "avg_ms": total * 1000 / calls, "max_ms": longest * 1000,
+                     "last_ms": last * 1000, "rows": rows}
+                    for name, (calls, total, longest, last, rows) in sorted(self.ui.items())]
+
+    def summary(self):
+        with self._lock:
+            return {"statements": len(self._statements),
+                    "queries": sum(s.calls for s in self._statements.values()),
+                    "query_ms": sum(s.seconds for s in self._statements.values()) * 1000,
+                    "warnings": len(self.warnings)}
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._planned.clear()  # so statements are explained again
+            self.warnings.clear()
+            self.events.clear()
+            self.ui.clear()
+            self.ui_events.clear()
+
+    def export(self, path):
+        """Write the event history and aggregates as JSON Lines (one object per line, tagged by ``kind``)."""
+        with self._lock:
+            events = [{"kind": "query", "time": e.started, "sql": e.stats.sql, "ms": e.seconds * 1000,
+                       "rows": e.rows, "thread": e.thread} for e in self.events]
+            events += [{"kind": "ui", "time": started, "name": name, "ms": seconds * 1000, "rows": rows}
+                       for started, name, seconds, rows in self.ui_events]
+        events.sort(key=lambda e: e["time"])
+        with open(path, "w", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event) + "\n")
+            for stats in self.statement_stats():
+                f.write(json.dumps(dict(stats, kind="statement")) + "\n")
+            for stats in self.ui_stats():
+                f.write(json.dumps(dict(stats, kind="ui_summary")) + "\n")
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor that reports execute and fetch timings to the connection's profiler.
+
+    Iteration reads ahead ``ITER_BATCH_ROWS`` rows at a time, so streaming a
+    large result pays for one timing (and one profiler lock) per batch, not
+    per row. The fetch methods hand out read-ahead rows first.
+    """
+    _event = None
+    _read_ahead = None
+
+    def _profiler(self):
+        return self.connection.profiler
+
+    def execute(self, sql, parameters=()):
+        profiler = self._profiler()
+        profiler.check_plan(self.connection, sql, parameters)
+        self._read_ahead = None
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._event = profiler.record(sql, time.perf_counter() - started, max(self.rowcount, 0))
+
+    def executemany(self, sql, seq_of_parameters):
+        # Plan-check with the first parameter set, as execute does.
+        seq_of_parameters = iter(seq_of_parameters)
+        first = next(seq_of_parameters, None)
+        if first is not None:
+            self._profiler().check_plan(self.connection, sql, first)
+            seq_of_parameters = itertools.chain((first,), seq_of_parameters)
+        self._read_ahead = None
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._event = self._profiler().record(sql, time.perf_counter() - started, max(self.rowcount, 0))
+
+    def _fetched(self, rows, started):
+        if self._event is not None:
+            self._profiler().add_rows(self._event, rows, time.perf_counter() - started)
+
+    def _take_read_ahead(self, size):
+        rows = []
+        while self._read_ahead and len(rows) < size:
+            rows.append(self._read_ahead.popleft())
+        return rows
+
+    def fetchone(self):
+        if self._read_ahead:
+            return self._read_ahead.popleft()
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(row is not None, started)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._take_read_ahead(size)
+        if len(rows) < size:
+            started = time.perf_counter()
+            more = super().fetchmany(size - len(rows))
+            self._fetched(len(more), started)
+            rows += more
+        return rows
+
+    def fetchall(self):
+        rows = self._take_read_ahead(len(self._read_ahead or ()))
+        started = time.perf_counter()
+        more = super().fetchall()
+        self._fetched(len(more), started)
+        return rows + more
+
+    def __next__(self):
+        if not self._read_ahead:
+            started = time.perf_counter()
+            self._read_ahead = deque(super().fetchmany(ITER_BATCH_ROWS))
+            self._fetched(len(self._read_ahead), started)
+            if not self._read_ahead:
+                raise StopIteration
+        return self._read_ahead.popleft()
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """Connection whose cursors (including ``execute`` shortcuts) are ProfiledCursors."""
+    profiler = None
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    # The C shortcuts create plain cursors, so route them through cursor().
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
@@ -0,0 +1,422 @@
+"""Versioned schema migrations for the inventory database.
+
+The schema version is stored in ``PRAGMA user_version``. Each migration runs
+once, in order, inside a single write transaction together with the version
+bump, so a crash leaves the database at the previous version. On a warm start
+the version already matches ``SCHEMA_VERSION`` and no DDL is executed at all.
+
+Migrations use ``IF NOT EXISTS`` so databases created before versioning (at
+version 0 with some of the tables and indexes already present) are adopted
+without errors.
+"""
+import logging
+import sqlite3
+
+log = logging.getLogger(__name__)
+
+
+def _create_tables(connection):
+    connection.execute('''
+    CREATE TABLE IF NOT EXISTS inventory (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        item_name TEXT NOT NULL CHECK(length(item_name) <= 100),
+        quantity INTEGER NOT NULL CHECK(quantity >= 0),
+        price REAL NOT NULL CHECK(price >= 0),
+        updated_by TEXT NOT NULL CHECK(length(updated_by) <= 50),
+        low_stock_threshold INTEGER DEFAULT 10 CHECK(low_stock_threshold >= 0)
+    )
+    ''')
+    connection.execute('''
+    CREATE TABLE IF NOT EXISTS audit_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        action TEXT NOT NULL,
+        item_id INTEGER,
+        item_name TEXT,
+        user TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_item_name ON inventory(item_name)")
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_quantity ON inventory(quantity)")
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_price ON inventory(price)")
+
+
+def _create_sort_and_audit_indexes(connection):
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_updated_by ON inventory(updated_by)")
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_audit_timestamp ON audit_log(timestamp)")
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_audit_item_id ON audit_log(item_id, timestamp)")
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_audit_user ON audit_log(user, timestamp)")
+
+
+def _create_unique_name_index(connection):
+    """Enforce the unique item name rule with a NOCASE unique index.
+
+    A database that already holds names differing only in case keeps a plain
+    NOCASE index, and writes fall back to an indexed duplicate probe inside
+    the write transaction until ``upgrade_features`` finds the duplicates
+    resolved.
+    """
+    try:
+        connection.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_item_name_unique "
+                           "ON inventory(item_name COLLATE NOCASE)")
+    except sqlite3.IntegrityError as e:
+        log.warning("Existing item names are not unique ignoring case, falling back to duplicate checks: %s", e)
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_item_name_nocase ON inventory(item_name COLLATE NOCASE)")
+        return
+    connection.execute("DROP INDEX IF EXISTS idx_item_name_nocase")
+
+
+def _create_search_index(connection):
+    """Create the FTS5 index on item names and the triggers that keep it in sync.
+
+    When SQLite was built without FTS5 the migration is still recorded and the
+    UI falls back to LIKE filtering until ``upgrade_features`` runs under an
+    SQLite that has it.
+    """
+    exists = _has_object(connection, 'table', 'inventory_fts')
+    try:
+        connection.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS inventory_fts USING fts5(
+            item_name, content='inventory', content_rowid='id', prefix='2 3'
+        )
+        ''')
+    except sqlite3.OperationalError as e:
+        log.warning("Full-text search unavailable, using LIKE filtering: %s", e)
+        return
+
+    connection.execute('''
+    CREATE TRIGGER IF NOT EXISTS inventory_fts_insert AFTER INSERT ON inventory BEGIN
+        INSERT INTO inventory_fts(rowid, item_name) VALUES (new.id, new.item_name);
+    END
+    ''')
+    connection.execute('''
+    CREATE TRIGGER IF NOT EXISTS inventory_fts_delete AFTER DELETE ON inventory BEGIN
+        INSERT INTO inventory_fts(inventory_fts, rowid, item_name) VALUES ('delete', old.id, old.item_name);
+    END
+    ''')
+    connection.execute('''
+    CREATE TRIGGER IF NOT EXISTS inventory_fts_update AFTER UPDATE OF item_name ON inventory BEGIN
+        INSERT INTO inventory_fts(inventory_fts, rowid, item_name) VALUES ('delete', old.id, old.item_name);
+        INSERT INTO inventory_fts(rowid, item_name) VALUES (new.id, new.item_name);
+    END
+    ''')
+    if not exists:
+        # Index items that were added before the FTS table existed.
+        connection.execute("INSERT INTO inventory_fts(inventory_fts) VALUES ('rebuild')")
+
+
+def _create_low_stock_index(connection):
+    # Partial index: holds only the items below their threshold, so listing or
+    # counting them costs as much as the number of low items. SQLite keeps it
+    # current on every insert/update/delete.
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_low_stock ON inventory(quantity, id) "
+                       "WHERE quantity < low_stock_threshold")
+
+
+# Per-item contributions to inventory_totals. Values are whole cents so the
+# running sum stays exact however many updates it absorbs.
+_ITEM_VALUE_CENTS = "CAST(ROUND({row}.quantity * {row}.price * 100) AS INTEGER)"
+_ITEM_LOW_STOCK = "IFNULL({row}.quantity < {row}.low_stock_threshold, 0)"
+
+
+def rebuild_summaries(connection):
+    """Recompute the dashboard summary tables from ``inventory`` and ``audit_log``."""
+    connection.execute("DELETE FROM inventory_totals")
+    connection.execute(f'''
+    INSERT INTO inventory_totals (id, item_count, total_quantity, value_cents, low_stock_count)
+    SELECT 1, COUNT(*), IFNULL(SUM(quantity), 0), IFNULL(SUM({_ITEM_VALUE_CENTS.format(row="inventory")}), 0),
+           IFNULL(SUM({_ITEM_LOW_STOCK.format(row="inventory")}), 0)
+    FROM inventory
+    ''')
+    connection.execute("DELETE FROM audit_daily")
+    connection.execute('''
+    INSERT INTO audit_daily (day, user, action, edits)
+    SELECT substr(timestamp, 1, 10), IFNULL(user, ''), action, COUNT(*) FROM audit_log GROUP BY 1, 2, 3
+    ''')
+
+
+def _create_summary_tables(connection):
+    """Trigger-maintained aggregates for the dashboard.
+
+    ``inventory_totals`` is a single row of table-wide totals and
+    ``audit_daily`` counts audit entries per day, user and action. The
+    triggers run inside the transaction of the write that fires them, so the
+    summaries can never disagree with the tables they describe, and reading
+    them costs the same at any table size.
+    """
+    connection.execute('''
+    CREATE TABLE IF NOT EXISTS inventory_totals (
+        id INTEGER PRIMARY KEY CHECK(id = 1),
+        item_count INTEGER NOT NULL,
+        total_quantity INTEGER NOT NULL,
+        value_cents INTEGER NOT NULL,
+        low_stock_count INTEGER NOT NULL
+    )
+    ''')
+    connection.execute('''
+    CREATE TABLE IF NOT EXISTS audit_daily (
+        day TEXT NOT NULL,
+        user TEXT NOT NULL,
+        action TEXT NOT NULL,
+        edits INTEGER NOT NULL,
+        PRIMARY KEY (day, user, action)
+    ) WITHOUT ROWID
+    ''')
+    new_value, old_value = _ITEM_VALUE_CENTS.format(row="new"), _ITEM_VALUE_CENTS.format(row="old")
+    new_low, old_low = _ITEM_LOW_STOCK.format(row="new"), _ITEM_LOW_STOCK.format(row="old")
+    connection.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS inventory_totals_insert AFTER INSERT ON inventory BEGIN
+        UPDATE inventory_totals SET item_count = item_count + 1, total_quantity = total_quantity + new.quantity,
+            value_cents = value_cents + {new_value}, low_stock_count = low_stock_count + {new_low};
+    END
+    ''')
+    connection.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS inventory_totals_delete AFTER DELETE ON inventory BEGIN
+        UPDATE inventory_totals SET item_count = item_count - 1, total_quantity = total_quantity - old.quantity,
+            value_cents = value_cents - {old_value}, low_stock_count = low_stock_count - {old_low};
+    END
+    ''')
+    connection.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS inventory_totals_update
+    AFTER UPDATE OF quantity, price, low_stock_threshold ON inventory BEGIN
+        UPDATE inventory_totals SET total_quantity = total_quantity + new.quantity - old.quantity,
+            value_cents = value_cents + {new_value} - {old_value},
+            low_stock_count = low_stock_count + {new_low} - {old_low};
+    END
+    ''')
+    connection.execute('''
+    CREATE TRIGGER IF NOT EXISTS audit_daily_insert AFTER INSERT ON audit_log BEGIN
+        INSERT INTO audit_daily (day, user, action, edits)
+        VALUES (substr(new.timestamp, 1, 10), IFNULL(new.user, ''), new.action, 1)
+        ON CONFLICT (day, user, action) DO UPDATE SET edits = edits + 1;
+    END
+    ''')
+    connection.execute('''
+    CREATE TRIGGER IF NOT EXISTS audit_daily_delete AFTER DELETE ON audit_log BEGIN
+        UPDATE audit_daily SET edits = edits - 1
+        WHERE day = substr(old.timestamp, 1, 10) AND user = IFNULL(old.user, '') AND action = old.action;
+    END
+    ''')
+    rebuild_summaries(connection)
+
+
+def _create_retention_state(connection):
+    # One row recording how far the audit log has been archived.
+    connection.execute('''
+    CREATE TABLE IF NOT EXISTS audit_retention (
+        id INTEGER PRIMARY KEY CHECK(id = 1),
+        archived_before TEXT,
+        archived_rows INTEGER NOT NULL DEFAULT 0,
+        last_run TEXT
+    )
+    ''')
+
+
+def _add_row_versions(connection):
+    # Bumped by every UPDATE of an item; editors compare-and-swap on it. Adding
+    # a column with a constant default only rewrites the schema, not the rows.
+    columns = {row[1] for row in connection.execute("PRAGMA table_info(inventory)")}
+    if "version" not in columns:
+        connection.execute("ALTER TABLE inventory ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+
+
+def _create_stock_movements(connection):
+    """Create the append-only stock movement ledger.
+
+    Each row is one quantity delta with the balance it left, so an item's
+    stock history reads straight off ``idx_movements_item``. Triggers reject
+    UPDATE and DELETE; movements outlive the items they moved.
+    """
+    connection.execute('''
+    CREATE TABLE IF NOT EXISTS stock_movements (
+        id INTEGER PRIMARY KEY,
+        item_id INTEGER NOT NULL,
+        delta INTEGER NOT NULL,
+        balance INTEGER NOT NULL,
+        reason TEXT NOT NULL,
+        reference TEXT,
+        user TEXT NOT NULL,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_movements_item ON stock_movements(item_id, id)")
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_movements_timestamp ON stock_movements(timestamp)")
+    for event in ("UPDATE", "DELETE"):
+        connection.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS stock_movements_no_{event.lower()} BEFORE {event} ON stock_movements BEGIN
+            SELECT RAISE(ABORT, 'stock movements are append-only');
+        END
+        ''')
+
+
+def _add_audit_changes(connection):
+    # Compact JSON of the fields an entry changed, {"field": [old, new]};
+    # NULL for entries written before this column existed.
+    columns = {row[1] for row in connection.execute("PRAGMA table_info(audit_log)")}
+    if "changes" not in columns:
+        connection.execute("ALTER TABLE audit_log ADD COLUMN changes TEXT")
+
+
+def _create_snapshot_tables(connection):
+    """Create the point-in-time inventory snapshot tables.
+
+    A full snapshot stores every item; a delta snapshot stores only the items
+    whose audit entries show a change since the previous snapshot, with a
+    NULL name for items deleted in between. ``audit_id`` is the last audit
+    entry the snapshot reflects, so later state is replayed from the audit
+    diffs after it.
+    """
+    connection.execute('''
+    CREATE TABLE IF NOT EXISTS inventory_snapshots (
+        id INTEGER PRIMARY KEY,
+        taken_at DATETIME NOT NULL,
+        full_id INTEGER,
+        audit_id INTEGER NOT NULL,
+        items INTEGER NOT NULL
+    )
+    ''')
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_snapshots_taken_at ON inventory_snapshots(taken_at)")
+    connection.execute('''
+    CREATE TABLE IF NOT EXISTS snapshot_items (
+        snapshot_id INTEGER NOT NULL,
+        item_id INTEGER NOT NULL,
+        item_name TEXT,
+        quantity INTEGER,
+        price REAL,
+        PRIMARY KEY (snapshot_id, item_id)
+    ) WITHOUT ROWID
+    ''')
+
+
+# Append new migrations here; never edit or reorder one that has shipped.
+MIGRATIONS = [
+    (1, "inventory and audit tables", _create_tables),
+    (2, "sort and audit indexes", _create_sort_and_audit_indexes),
+    (3, "case-insensitive unique item names", _create_unique_name_index),
+    (4, "full-text search on item names", _create_search_index),
+    (5, "low-stock partial index", _create_low_stock_index),
+    (6, "dashboard summary tables", _create_summary_tables),
+    (7, "audit retention state", _create_retention_state),
+    (8, "row versions for optimistic concurrency", _add_row_versions),
+    (9, "stock movement ledger", _create_stock_movements),
+    (10, "before/after changes in audit entries", _add_audit_changes),
+    (11, "inventory snapshots", _create_snapshot_tables),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def _has_object(connection, kind, name):
+    return connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = ? AND name = ?", (kind, name)
+    ).fetchone() is not None
+
+
+def schema_version(connection):
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _apply_migrations(connection):
+    # Re-read inside the write transaction: another process may have migrated.
+    current = schema_version(connection)
+    if current > SCHEMA_VERSION:
+        raise sqlite3.DatabaseError(
+            f"Database schema version {current} is newer than this program supports ({SCHEMA_VERSION})."
+        )
+    applied = []
+    for version, description, migration in MIGRATIONS:
+        if version <= current:
+            continue
+        log.info("Applying schema migration %s: %s", version, description)
+        migration(connection)
+        applied.append(version)
+    connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return applied
+
+
+def migrate(db):
+    """Bring ``db`` up to ``SCHEMA_VERSION``; returns the migration numbers applied.
+
+    The version check uses a reader connection, so a warm start takes no write
+    lock and runs no DDL.
+    """
+    if db.query_one("PRAGMA user_version")[0] == SCHEMA_VERSION:
+        return []
+    return db.write(_apply_migrations)
+
+
+def create_archive_schema(connection, schema="archive"):
+    """Create the archived audit table in the attached database ``schema``.
+
+    Rows keep their audit_log ids, so re-archiving a row that was copied
+    but not yet deleted from audit_log (after a crash between the two
+    steps) is a no-op.
+    """
+    connection.execute(f'''
+    CREATE TABLE IF NOT EXISTS {schema}.audit_archive (
+        id INTEGER PRIMARY KEY,
+        action TEXT NOT NULL,
+        item_id INTEGER,
+        item_name TEXT,
+        user TEXT,
+        timestamp DATETIME,
+        changes TEXT
+    )
+    ''')
+    # Archives created before audit entries carried changes get the column
+    # appended, so rows still copy across column for column.
+    columns = {row[1] for row in connection.execute(f"PRAGMA {schema}.table_info(audit_archive)")}
+    if "changes" not in columns:
+        connection.execute(f"ALTER TABLE {schema}.audit_archive ADD COLUMN changes TEXT")
+    connection.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_archive_timestamp ON audit_archive(timestamp)")
+    connection.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_archive_item_id ON audit_archive(item_id, timestamp)")
+    connection.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_archive_user ON audit_archive(user, timestamp)")
+
+
+def _has_case_duplicates(connection):
+    # One pass over the NOCASE index left by the fallback.
+    return connection.execute(
+        "SELECT 1 FROM inventory GROUP BY item_name COLLATE NOCASE HAVING COUNT(*) > 1 LIMIT 1"
+    ).fetchone() is not None
+
+
+def _fts5_available(connection):
+    return any(row[0] == 'ENABLE_FTS5' for row in connection.execute("PRAGMA compile_options"))
+
+
+def _upgrade_features(connection, missing):
+    if 'unique_names' in missing and not _has_case_duplicates(connection):
+        _create_unique_name_index(connection)
+    if 'fts' in missing:
+        _create_search_index(connection)
+    features = schema_features(connection)
+    return [name for name in missing if features[name]]
+
+
+def upgrade_features(db):
+    """Create the optional features whose migrations fell back, once they can be.
+
+    Migrations 3 and 4 are recorded even when the unique name index (names
+    duplicated ignoring case) or the FTS5 table (SQLite built without FTS5)
+    could not be created. This checks on every start, with a reader and
+    without a write lock once both exist, and creates them as soon as the
+    duplicates are cleaned up or FTS5 is available. Returns the features
+    added, as named by ``schema_features``.
+    """
+    with db.reader() as connection:
+        features = schema_features(connection)
+        missing = [name for name, present in features.items() if not present]
+        if 'fts' in missing and not _fts5_available(connection):
+            missing.remove('fts')
+        if 'unique_names' in missing and _has_case_duplicates(connection):
+            missing.remove('unique_names')
+    if not missing:
+        return []
+    return db.write(_upgrade_features, missing)
+
+
+def schema_features(connection):
+    """Report optional schema features: ``{'fts': bool, 'unique_names': bool}``."""
+    return {
+        'fts': _has_object(connection, 'table', 'inventory_fts'),
+        'unique_names': _has_object(connection, 'index', 'idx_item_name_unique'),
+    }
@@ -0,0 +1,414 @@
+"""Headless HTTP/JSON server so several stockroom stations can share one inventory.
+
+Every station talks to one process that owns the database, instead of each
+opening its own ``inventory.db``. Requests are handled on a bounded thread
+pool; each one runs an ``InventoryStore`` call against the shared
+connection pool (pooled WAL readers plus the single writer), so reads run in
+parallel and writes are serialized without "database is locked" errors.
+
+    python inventory_server.py --db ../inventory.db --host 0.0.0.0 --port 8765 --token SECRET
+
+Endpoints (JSON in and out unless noted):
+
+    GET    /health
+    GET    /items?q=&ranked=1&low_stock=1&limit=&after_id=
+    GET    /items/<id>
+    POST   /items                {"item_name", "quantity", "price", "updated_by"}
+    PUT    /items/<id>           same body, plus the "version" it was read at
+                                 (or an If-Match header) to reject stale writes
+    DELETE /items/<id>
+    GET    /items/<id>/movements?before_id=&limit=
+    GET    /items/as-of?date=&after_id=&limit=
+                                 items as they were at the end of that day
+    POST   /movements            {"movements": [{"item_id", "delta", "reason", "reference", "updated_by"}, ...]}
+                                 applies every delta in one transaction; returns
+                                 {"applied": n, "rejected": [{"index", "error"}, ...]}
+    GET    /low-stock?limit=
+    GET    /dashboard?days=
+    GET    /audit?date_from=&date_to=&user=&action=&item_id=&after_timestamp=&after_id=&limit=
+    GET    /report?date_from=&as_of=
+                                 streams an .xlsx workbook (inventory as of a date)
+
+Validation failures return 400, duplicate names 409 and missing items 404,
+each as ``{"error": message}``. A PUT whose version is stale returns 409 with
+the item as it is now under ``"current"``. With ``--token``, every request
+must send ``Authorization: Bearer <token>``.
+
+While it runs, the server also takes the periodic inventory snapshot that
+as-of queries start from.
+"""
+import argparse
+import hmac
+import json
+import logging
+import os
+import re
+import shutil
+import socket
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from inventory_core import DuplicateNameError, EditConflictError, ItemNotFoundError, ValidationError
+from inventory_store import AUDIT_PAGE_SIZE, DASHBOARD_DAYS, MOVEMENT_PAGE_SIZE, InventoryStore
+
+DEFAULT_PORT = 8765
+IDLE_TIMEOUT = 15  # seconds a keep-alive connection may hold a worker between requests
+MAX_BODY_BYTES = 64 * 1024
+MAX_PAGE_SIZE = 1000
+SNAPSHOT_CHECK_SECONDS = 3600
+
+ITEM_FIELDS = ("id", "item_name", "quantity", "price", "updated_by", "low_stock", "version")
+HISTORIC_ITEM_FIELDS = ("id", "item_name", "quantity", "price")
+AUDIT_FIELDS = ("id", "action", "item_id", "item_name", "user", "timestamp", "changes")
+ACTIVITY_FIELDS = ("day", "user", "added", "updated", "deleted", "total")
+MOVEMENT_FIELDS = ("id", "item_id", "delta", "balance", "reason", "reference", "updated_by", "timestamp")
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def item_json(row):
+    item = dict(zip(ITEM_FIELDS, row))
+    item["low_stock"] = bool(item["low_stock"])
+    return item
+
+
+def audit_json(row):
+    entry = dict(zip(AUDIT_FIELDS, row))
+    entry["changes"] = json.loads(entry["changes"]) if entry["changes"] else {}
+    return entry
+
+
+def default_db_path():
+    # Same file the desktop app opens.
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'inventory.db')
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that hands each connection to a fixed-size thread pool.
+
+    Unlike ThreadingHTTPServer, a burst of clients cannot create an unbounded
+    number of threads; extra connections wait in the pool's queue. A
+    keep-alive connection holds its worker until it goes idle for
+    ``IDLE_TIMEOUT`` seconds, so ``workers`` should cover the stations.
+    """
+    def __init__(self, address, handler, store, workers=16, token=None):
+        super().__init__(address, handler)
+        self.store = store
+        self.token = token
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inventory-http")
+        self._open = set()
+        self._open_lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        with self._open_lock:
+            self._open.add(request)
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            with self._open_lock:
+                self._open.discard(request)
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        with self._open_lock:
+            for request in self._open:  # Wake workers blocked on idle keep-alive connections.
+                try:
+                    request.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        self.executor.shutdown(wait=False)
+
+
+class InventoryRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so clients reuse their connection.
+    disable_nagle_algorithm = True  # Headers and body go out as separate writes.
+    timeout = IDLE_TIMEOUT
+    server_version = "InventoryServer/1.0"
+    quiet = False
+
+    ROUTES = [
+        ("GET", re.compile(r"/health"), "health"),
+        ("GET", re.compile(r"/items"), "list_items"),
+        ("POST", re.compile(r"/items"), "create_item"),
+        ("GET", re.compile(r"/items/(\d+)"), "get_item"),
+        ("PUT", re.compile(r"/items/(\d+)"), "update_item"),
+        ("DELETE", re.compile(r"/items/(\d+)"), "delete_item"),
+        ("GET", re.compile(r"/items/(\d+)/movements"), "item_movements"),
+        ("GET", re.compile(r"/items/as-of"), "items_as_of"),
+        ("POST", re.compile(r"/movements"), "record_movements"),
+        ("GET", re.compile(r"/low-stock"), "low_stock"),
+        ("GET", re.compile(r"/dashboard"), "dashboard"),
+        ("GET", re.compile(r"/audit"), "audit"),
+        ("GET", re.compile(r"/report"), "report"),
+    ]
+
+    @property
+    def store(self):
+        return self.server.store
+
+    # --- Plumbing ---
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_PUT(self):
+        self.dispatch("PUT")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+    def dispatch(self, method):
+        url = urlsplit(self.path)
+        self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            self.check_token()
+            for route_method, pattern, name in self.ROUTES:
+                match = pattern.fullmatch(url.path.rstrip("/") or "/")
+                if match and route_method == method:
+                    getattr(self, name)(*match.groups())
+                    return
+            if any(pattern.fullmatch(url.path.rstrip("/")) for _, pattern, _ in self.ROUTES):
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} is not allowed here.")
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No such endpoint: {url.path}")
+        except HTTPError as e:
+            self.send_json({"error": str(e)}, e.status)
+        except EditConflictError as e:
+            self.send_json({"error": str(e), "current": item_json(e.current)}, HTTPStatus.CONFLICT)
+        except DuplicateNameError as e:
+            self.send_json({"error": str(e)}, HTTPStatus.CONFLICT)
+        except ItemNotFoundError as e:
+            self.send_json({"error": str(e)}, HTTPStatus.NOT_FOUND)
+        except ValidationError as e:
+            self.send_json({"error": str(e)}, HTTPStatus.BAD_REQUEST)
+        except sqlite3.Error as e:
+            self.log_error("Database error: %s", e)
+            self.send_json({"error": f"Database error: {e}"}, HTTPStatus.INTERNAL_SERVER_ERROR)
+        except Exception as e:
+            self.log_error("Request failed: %r", e)
+            self.send_json({"error": "Internal server error."}, HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    def check_token(self):
+        if self.server.token is None:
+            return
+        supplied = self.headers.get("Authorization", "")
+        # compare_digest only takes ASCII str, so compare the encoded bytes.
+        if not hmac.compare_digest(supplied.encode("utf-8", "surrogateescape"),
+                                   f"Bearer {self.server.token}".encode("utf-8", "surrogateescape")):
+            raise HTTPError(HTTPStatus.UNAUTHORIZED, "Missing or wrong access token.")
+
+    def read_json(self):
+        length = self.headers.get("Content-Length", "").strip() or "0"
+        if not re.fullmatch(r"[0-9]+", length):
+            self.close_connection = True
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Content-Length must be a non-negative integer.")
+        length = int(length)
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True  # The unread body would be parsed as the next request.
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body is too large.")
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Request body must be JSON.")
+        if not isinstance(body, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Request body must be a JSON object.")
+        return body
+
+    def int_param(self, name, default=None, maximum=None):
+        value = self.query.get(name)
+        if value in (None, ""):
+            return default
+        try:
+            number = int(value)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"'{name}' must be an integer.")
+        if number < 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"'{name}' must be non-negative.")
+        return min(number, maximum) if maximum is not None else number
+
+    def flag_param(self, name):
+        return self.query.get(name, "").lower() in ("1", "true", "yes")
+
+    def send_json(self, payload, status=HTTPStatus.OK):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    # --- Endpoints ---
+    def health(self):
+        self.send_json({"status": "ok", "fts": self.store.fts_enabled})
+
+    def list_items(self):
+        rows = self.store.search(self.query.get("q", ""), self.flag_param("ranked"),
+                                 self.int_param("limit", 100, MAX_PAGE_SIZE), self.int_param("after_id"),
+                                 self.flag_param("low_stock"))
+        self.send_json({"items": [item_json(row) for row in rows]})
+
+    def get_item(self, item_id):
+        row = self.store.get_item(int(item_id))
+        if row is None:
+            raise ItemNotFoundError(int(item_id))
+        self.send_json(item_json(row))
+
+    def expected_version(self, body):
+        """The version a PUT was based on: ``If-Match`` or the body's ``version``; None overwrites."""
+        value = self.headers.get("If-Match", body.get("version"))
+        if value is None:
+            return None
+        try:
+            return int(str(value).strip('" '))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid version: {value!r}")
+
+    def save(self, item_id=None):
+        body = self.read_json()
+        action, saved_id = self.store.save_item(body.get("item_name", ""), body.get("quantity", ""),
+                                                body.get("price", ""), body.get("updated_by", ""),
+                                                item_id=item_id,
+                                                expected_version=self.expected_version(body) if item_id else None)
+        row = self.store.get_item(saved_id)
+        if row is None:
+            raise ItemNotFoundError(saved_id)  # Deleted by another client right after the save.
+        status = HTTPStatus.CREATED if action == "Added" else HTTPStatus.OK
+        self.send_json(dict(item_json(row), action=action), status)
+
+    def create_item(self):
+        self.save()
+
+    def update_item(self, item_id):
+        self.save(int(item_id))
+
+    def delete_item(self, item_id):
+        if not self.store.delete_item(int(item_id)):
+            raise ItemNotFoundError(int(item_id))
+        self.send_json({"deleted": int(item_id)})
+
+    def items_as_of(self):
+        rows = self.store.inventory_as_of(self.query.get("date", ""), self.int_param("after_id"),
+                                          self.int_param("limit", 100, MAX_PAGE_SIZE))
+        self.send_json({"items": [dict(zip(HISTORIC_ITEM_FIELDS, row)) for row in rows]})
+
+    def item_movements(self, item_id):
+        rows = self.store.movements(int(item_id), self.int_param("before_id"),
+                                    self.int_param("limit", MOVEMENT_PAGE_SIZE, MAX_PAGE_SIZE))
+        self.send_json({"movements": [dict(zip(MOVEMENT_FIELDS, row)) for row in rows]})
+
+    def record_movements(self):
+        movements = self.read_json().get("movements")
+        if not isinstance(movements, list) or not all(isinstance(m, dict) for m in movements):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "'movements' must be a list of objects.")
+        applied, rejected = self.store.record_movements(
+            [(m.get("item_id"), m.get("delta"), m.get("reason"), m.get("reference"), m.get("updated_by"))
+             for m in movements])
+        self.send_json({"applied": applied, "rejected": [{"index": index, "error": message}
+                                                         for index, message in rejected]})
+
+    def low_stock(self):
+        rows = self.store.low_stock_items(self.int_param("limit", 100, MAX_PAGE_SIZE))
+        self.send_json({"items": [item_json(row) for row in rows]})
+
+    def dashboard(self):
+        figures = self.store.dashboard(self.int_param("days", DASHBOARD_DAYS, 366) or 1)
+        figures["activity"] = [dict(zip(ACTIVITY_FIELDS, row)) for row in figures["activity"]]
+        self.send_json(figures)
+
+    def audit(self):
+        filters = {key: self.query.get(key, "") for key in ("date_from", "date_to", "user", "action")}
+        filters["item_id"] = self.int_param("item_id")
+        after = None
+        if self.query.get("after_timestamp"):
+            after = (self.query["after_timestamp"], self.int_param("after_id", 0))
+        rows = self.store.audit_page(filters, after, self.int_param("limit", AUDIT_PAGE_SIZE, MAX_PAGE_SIZE))
+        self.send_json({"entries": [audit_json(row) for row in rows]})
+
+    def report(self):
+        workdir = tempfile.mkdtemp(prefix="inventory_report_")
+        try:
+            path = os.path.join(workdir, "report.xlsx")
+            as_of = self.query.get("as_of", "")
+            self.store.export_report(path, audit_filters={"date_from": self.query.get("date_from", ""),
+                                                          "date_to": as_of[:10]}, as_of=as_of or None)
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+            self.send_header("Content-Disposition", 'attachment; filename="inventory_audit_report.xlsx"')
+            self.send_header("Content-Length", str(os.path.getsize(path)))
+            self.end_headers()
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, self.wfile)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_snapshots(store, stop):
+    """Take the periodic inventory snapshot whenever one is due, until ``stop`` is set."""
+    while not stop.is_set():
+        try:
+            if store.snapshot_due():
+                store.take_snapshot()
+        except sqlite3.Error as e:
+            print(f"Inventory snapshot failed: {e}")
+        stop.wait(SNAPSHOT_CHECK_SECONDS)
+
+
+def make_server(store, host="127.0.0.1", port=DEFAULT_PORT, workers=16, token=None, quiet=False):
+    """Create (but do not start) a server for ``store``; call ``serve_forever`` to run it."""
+    handler = type("Handler", (InventoryRequestHandler,), {"quiet": quiet})
+    return PooledHTTPServer((host, port), handler, store, workers=workers, token=token)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=default_db_path(), help="database file (default: the desktop app's)")
+    parser.add_argument("--host", default="127.0.0.1", help="use 0.0.0.0 to accept other stations")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=16, help="request threads")
+    parser.add_argument("--read-pool", type=int, default=8, help="pooled read-only SQLite connections")
+    parser.add_argument("--token", default=os.environ.get("INVENTORY_TOKEN"),
+                        help="shared access token (default: $INVENTORY_TOKEN; none disables the check)")
+    parser.add_argument("--quiet", action="store_true", help="do not log every request")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    store = InventoryStore.open(os.path.abspath(args.db), read_pool_size=args.read_pool)
+    server = make_server(store, args.host, args.port, args.workers, args.token, args.quiet)
+    host = socket.gethostname() if args.host == "0.0.0.0" else args.host
+    print(f"Serving {args.db} on http://{host}:{server.server_port}")
+    stop = threading.Event()
+    snapshots = threading.Thread(target=run_snapshots, args=(store, stop), name="inventory-snapshots", daemon=True)
+    snapshots.start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        snapshots.join()
+        server.server_close()
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1107 @@
+"""Headless inventory service: items, search, bulk import, audit log and reports.
+
+``InventoryStore`` wraps a ``Database`` with the operations the desktop UI
+offers, without any Tk dependency, so the same code can back a service, a
+benchmark or a load test. Methods block and are safe to call from any thread;
+writes are serialized by the database writer. UIs that must not block can run
+any method on the store's worker pool with ``submit``.
+
+Quantity deltas (receipts, picks, scans) go through ``record_movements``,
+which applies ``quantity = quantity + delta`` and appends to the
+``stock_movements`` ledger in the same transaction. ``MovementFeed`` groups a
+high-rate source of movements into few commits.
+
+Audit entries older than the retention period can be moved to an archive
+database attached as ``archive`` (``<name>_archive.db`` next to the main
+file). Audit pages and reports read the archive too whenever their date
+range reaches back past the archived boundary.
+
+``take_snapshot`` records the inventory periodically (a full copy, then
+deltas of the items changed since). ``inventory_as_of`` rebuilds any past
+date from the nearest earlier snapshot plus the audit diffs written after it.
+"""
+import heapq
+import itertools
+import json
+import logging
+import math
+import os
+import queue
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from inventory_core import (MAX_PRICE, DuplicateNameError, EditConflictError, ItemNotFoundError, ValidationError,
+                            as_integer, audit_changes, validate_item, validate_movement, validate_user)
+from inventory_db import Database
+from inventory_import import IMPORT_BATCH_SIZE, import_items
+from inventory_schema import create_archive_schema, migrate, rebuild_summaries, schema_features, upgrade_features
+
+# The sixth column is the low-stock flag (1 when quantity is below the item's threshold),
+# the seventh the row version that every update bumps.
+LOW_STOCK_CLAUSE = "quantity < low_stock_threshold"
+INVENTORY_SELECT = f"SELECT id, item_name, quantity, price, updated_by, {LOW_STOCK_CLAUSE}, version FROM inventory"
+RANKED_SEARCH_LIMIT = 500
+VIEW_SORT_COLUMNS = ("id", "item_name", "quantity", "price", "updated_by")  # each one indexed
+ANCHOR_STRIDE = 1000  # rows between the keys ``anchors`` records
+
+# The seventh column, ``changes``, is the compact JSON diff made by audit_changes.
+AUDIT_SELECT = "SELECT id, action, item_id, item_name, user, timestamp, changes FROM audit_log"
+AUDIT_INSERT = "INSERT INTO audit_log (action, item_id, item_name, user, changes) VALUES (?, ?, ?, ?, ?)"
+AUDIT_PAGE_SIZE = 200
+ARCHIVE_SELECT = "SELECT id, action, item_id, item_name, user, timestamp, changes FROM archive.audit_archive"
+AUDIT_RETENTION_DAYS = 365
+ARCHIVE_BATCH_SIZE = 5000  # audit rows moved per write transaction
+ARCHIVE_INTERVAL_HOURS = 24
+VACUUM_STEP_PAGES = 2000  # pages released per incremental_vacuum call, so other writes interleave
+
+DASHBOARD_DAYS = 14
+
+MOVEMENT_SELECT = "SELECT id, item_id, delta, balance, reason, reference, user, timestamp FROM stock_movements"
+MOVEMENT_INSERT = ("INSERT INTO stock_movements (item_id, delta, balance, reason, reference, user) "
+                   "VALUES (?, ?, ?, ?, ?, ?)")
+MOVEMENT_PAGE_SIZE = 200
+MOVEMENT_BATCH_SIZE = 2000  # most movements a MovementFeed commits in one transaction
+
+SNAPSHOT_FIELDS = ("item_name", "quantity", "price")
+SNAPSHOT_INTERVAL_HOURS = 24
+SNAPSHOT_FULL_EVERY = 30  # a full copy starts each chain of delta snapshots
+
+REPORT_BATCH_SIZE = 5000
+BATCH_CHUNK_SIZE = 500  # ids per "IN (...)" lookup, well under SQLite's variable limit
+
+log = logging.getLogger(__name__)
+
+
+def build_fts_query(text):
+    """Turn free text into an FTS5 query: every token must match as a prefix."""
+    tokens = re.findall(r"\w+", text)
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def build_audit_filter(date_from="", date_to="", user="", action="", item_id=None):
+    """Return ``(clauses, params)`` for the audit filters; dates are YYYY-MM-DD, both inclusive."""
+    clauses, params = [], []
+    if date_from:
+        clauses.append("timestamp >= ?")
+        params.append(date_from)
+    if date_to:
+        clauses.append("timestamp < date(?, '+1 day')")
+        params.append(date_to)
+    if user:
+        clauses.append("user = ?")
+        params.append(user)
+    if action:
+        clauses.append("action = ?")
+        params.append(action)
+    if item_id is not None:
+        clauses.append("item_id = ?")
+        params.append(item_id)
+    return clauses, params
+
+
+def as_of_cutoff(as_of):
+    """Exclusive audit timestamp bound for ``as_of``: a YYYY-MM-DD date covers that whole day."""
+    text = str(as_of).strip()
+    for fmt, step in (("%Y-%m-%d", timedelta(days=1)), ("%Y-%m-%d %H:%M:%S", timedelta(seconds=1))):
+        try:
+            return (datetime.strptime(text, fmt) + step).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            pass
+    raise ValidationError(f"Invalid date '{as_of}', use YYYY-MM-DD.")
+
+
+def write_report_sheet(wb, title, headers, col_widths, rows, total, on_progress):
+    """Stream ``rows`` (a cursor or any row iterator) into a write-only sheet, one batch at a time."""
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    from openpyxl.utils import get_column_letter
+
+    ws = wb.create_sheet(title=title)
+    for i, width in enumerate(col_widths, 1):
+        ws.column_dimensions[get_column_letter(i)].width = width
+
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = Font(bold=True)
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    written = 0
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, REPORT_BATCH_SIZE))
+        if not batch:
+            break
+        for row in batch:
+            ws.append(row)
+        written += len(batch)
+        if on_progress is not None:
+            on_progress(title, written, total)
+    return written
+
+
+def archive_path(path):
+    """Path of the audit archive database that belongs to the database at ``path``."""
+    return os.path.splitext(path)[0] + "_archive.db"
+
+
+class InventoryStore:
+    """Inventory operations on top of a ``Database``.
+
+    ``fts_enabled`` and ``unique_names`` describe optional schema features and
+    are read from the schema by ``initialize``; without FTS5, filtering falls
+    back to LIKE, and without the NOCASE unique index, writes fall back to an
+    indexed duplicate probe inside the write transaction.
+    """
+
+    def __init__(self, db, workers=4):
+        self.db = db
+        self.fts_enabled = False
+        self.unique_names = False
+        self.archived_before = None  # audit rows older than this timestamp live in the archive
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inventory-store")
+
+    @classmethod
+    def open(cls, path, **db_options):
+        """Open (and if needed migrate) the database at ``path``, with its audit archive attached."""
+        db_options.setdefault("attach", {"archive": archive_path(path)})
+        store = cls(Database(path, **db_options))
+        store.initialize()
+        return store
+
+    def initialize(self):
+        """Bring the schema up to date; returns the migration numbers applied."""
+        applied = migrate(self.db)
+        upgrade_features(self.db)
+        with self.db.reader() as connection:
+            features = schema_features(connection)
+        self.fts_enabled = features['fts']
+        self.unique_names = features['unique_names']
+        if "archive" in self.db.attach:
+            state = self.db.query_one("SELECT archived_before FROM audit_retention")
+            self.archived_before = state[0] if state else None
+        return applied
+
+    def submit(self, func, *args, **kwargs):
+        """Run ``func(*args, **kwargs)`` (typically a store method) on a worker; returns a Future."""
+        return self._executor.submit(func, *args, **kwargs)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.db.close()
+
+    # --- Items ---
+    def get_item(self, item_id):
+        """Return ``(id, item_name, quantity, price, updated_by, low_stock, version)`` or None."""
+        return self.db.query_one(INVENTORY_SELECT + " WHERE id=?", (item_id,))
+
+    def _is_duplicate_name(self, connection, name, exclude_id=None):
+        # Index probe on the NOCASE name index.
+        if exclude_id is None:
+            row = connection.execute("SELECT 1 FROM inventory WHERE item_name = ? COLLATE NOCASE LIMIT 1",
+                                     (name,)).fetchone()
+        else:
+            row = connection.execute("SELECT 1 FROM inventory WHERE item_name = ? COLLATE NOCASE AND id != ? LIMIT 1",
+                                     (name, exclude_id)).fetchone()
+        return row is not None
+
+    def _save(self, connection, item, item_id, expected_version=None):
+        name, quantity, price, user = item
+        # The NOCASE unique index rejects duplicates inside the write itself,
+        # so there is no check-then-write race between stations.
+        if not self.unique_names and self._is_duplicate_name(connection, name, exclude_id=item_id):
+            raise DuplicateNameError(name)
+        if item_id is None:
+            cursor = connection.execute(
+                "INSERT INTO inventory (item_name, quantity, price, updated_by) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT DO NOTHING",
+                item
+            )
+            if cursor.rowcount == 0:
+                raise DuplicateNameError(name)
+            saved_id = cursor.lastrowid
+            action = "Added"
+            changes = audit_changes(after={"item_name": name, "quantity": quantity, "price": price})
+        else:
+            # Compare-and-swap on the row version: the write lock is held only
+            # for this statement, never while someone edits the form.
+            previous = connection.execute("SELECT item_name, quantity, price FROM inventory WHERE id=?",
+                                          (item_id,)).fetchone()
+            query = "UPDATE inventory SET item_name=?, quantity=?, price=?, updated_by=?, version=version+1 WHERE id=?"
+            params = item + (item_id,)
+            if expected_version is not None:
+                query += " AND version=?"
+                params += (expected_version,)
+            try:
+                cursor = connection.execute(query, params)
+            except sqlite3.IntegrityError as e:
+                if "UNIQUE" not in str(e):
+                    raise
+                raise DuplicateNameError(name)
+            if cursor.rowcount == 0:
+                current = connection.execute(INVENTORY_SELECT + " WHERE id=?", (item_id,)).fetchone()
+                if current is None:
+                    raise ItemNotFoundError(item_id)
+                raise EditConflictError(current)
+            if quantity != previous[1]:
+                # A stock count typed into the form; the ledger records it as a delta.
+                connection.execute(MOVEMENT_INSERT, (item_id, quantity - previous[1], quantity, "edit", None, user))
+            saved_id = item_id
+            action = "Updated"
+            changes = audit_changes(dict(zip(("item_name", "quantity", "price"), previous)),
+                                    {"item_name": name, "quantity": quantity, "price": price})
+
+        connection.execute(AUDIT_INSERT, (action, saved_id, name, user, changes))
+        return action, saved_id
+
+    def save_item(self, name, quantity, price, user, item_id=None, expected_version=None):
+        """Validate and add (``item_id`` None) or update an item; returns ``(action, item_id)``.
+
+        With ``expected_version`` (the version the editor loaded) an update
+        only applies if nobody changed the item since; otherwise it raises
+        EditConflictError carrying the current row. Raises ValidationError
+        (including DuplicateNameError and ItemNotFoundError) with a
+        user-facing message.
+        """
+        item = validate_item(str(name), str(quantity), str(price), str(user))
+        return self.db.write(self._save, item, item_id, expected_version)
+
+    def _delete(self, connection, item_id):
+        row = connection.execute("SELECT item_name, updated_by, quantity, price FROM inventory WHERE id=?",
+                                 (item_id,)).fetchone()
+        if row:
+            item_name, user, quantity, price = row
+            changes = audit_changes({"item_name": item_name, "quantity": quantity, "price": price})
+        else:
+            item_name, user, changes = "Unknown", "Unknown", None
+
+        cursor = connection.execute("DELETE FROM inventory WHERE id=?", (item_id,))
+        connection.execute(AUDIT_INSERT, ("Deleted", item_id, item_name, user, changes))
+        return cursor.rowcount > 0
+
+    def delete_item(self, item_id):
+        """Delete an item and log it; returns False if it no longer existed."""
+        return self.db.write(self._delete, item_id)
+
+    # --- Batch operations ---
+    def _rows_for(self, connection, item_ids, select=INVENTORY_SELECT):
+        rows = []
+        for start in range(0, len(item_ids), BATCH_CHUNK_SIZE):
+            chunk = item_ids[start:start + BATCH_CHUNK_SIZE]
+            rows += connection.execute(select + f" WHERE id IN ({', '.join('?' * len(chunk))})",
+                                       chunk).fetchall()
+        return rows
+
+    def _log_updates(self, connection, entries, user):
+        """Audit ``(item_id, item_name, changes)`` entries as 'Updated' by ``user``."""
+        connection.executemany(AUDIT_INSERT, [("Updated", item_id, item_name, user, changes)
+                                              for item_id, item_name, changes in entries])
+
+    def _delete_many(self, connection, item_ids):
+        rows = self._rows_for(connection, item_ids)
+        connection.executemany("DELETE FROM inventory WHERE id=?", [(row[0],) for row in rows])
+        connection.executemany(AUDIT_INSERT, [
+            ("Deleted", row[0], row[1], row[4], audit_changes({"item_name": row[1], "quantity": row[2], "price": row[3]}))
+            for row in rows
+        ])
+        return rows
+
+    def delete_items(self, item_ids):
+        """Delete many items in one transaction; returns the deleted rows (ids already gone are skipped)."""
+        return self.db.write(self._delete_many, list(item_ids))
+
+    def _adjust_quantities(self, connection, item_ids, delta, user):
+        rows = self._rows_for(connection, item_ids)
+        negative = sum(1 for row in rows if row[2] + delta < 0)
+        if negative:
+            raise ValidationError(f"Adjusting by {delta:+d} would make the quantity of {negative:,} item(s) negative.")
+        connection.executemany("UPDATE inventory SET quantity = quantity + ?, updated_by = ?, version = version + 1 WHERE id = ?",
+                               [(delta, user, row[0]) for row in rows])
+        connection.executemany(MOVEMENT_INSERT, [(row[0], delta, row[2] + delta, "adjustment", None, user)
+                                                 for row in rows])
+        self._log_updates(connection, [(row[0], row[1], audit_changes({"quantity": row[2]}, {"quantity": row[2] + delta}))
+                                       for row in rows], user)
+        return [row[0] for row in rows]
+
+    def adjust_quantities(self, item_ids, delta, user):
+        """Add ``delta`` to the quantity of every item in one transaction; returns the updated ids.
+
+        Nothing is changed if any quantity would go negative.
+        """
+        try:
+            delta = as_integer(delta)
+        except (TypeError, ValueError):
+            raise ValidationError("Quantity change must be an integer.")
+        if delta == 0:
+            raise ValidationError("Quantity change must not be zero.")
+        user = validate_user(str(user))
+        return self.db.write(self._adjust_quantities, list(item_ids), delta, user)
+
+    def _change_prices(self, connection, item_ids, factor, user):
+        rows = self._rows_for(connection, item_ids)
+        for row in rows:
+            # The same bound validate_item puts on a typed price.
+            if row[3] * factor > MAX_PRICE:
+                raise ValidationError(f"Price change would take item ID {row[0]} above {MAX_PRICE:,}.")
+        connection.executemany("UPDATE inventory SET price = ROUND(price * ?, 2), updated_by = ?, version = version + 1 WHERE id = ?",
+                               [(factor, user, row[0]) for row in rows])
+        # Read the new prices back rather than repeat SQLite's rounding in Python.
+        new_prices = dict(self._rows_for(connection, [row[0] for row in rows], "SELECT id, price FROM inventory"))
+        self._log_updates(connection, [(row[0], row[1], audit_changes({"price": row[3]}, {"price": new_prices[row[0]]}))
+                                       for row in rows], user)
+        return [row[0] for row in rows]
+
+    def change_prices(self, item_ids, percent, user):
+        """Change the price of every item by ``percent`` (e.g. 5 or -10) in one transaction; returns the updated ids."""
+        try:
+            percent = float(percent)
+        except (TypeError, ValueError):
+            raise ValidationError("Price change must be a number.")
+        if not math.isfinite(percent):
+            raise ValidationError("Price change must be a number.")
+        if percent < -100:
+            raise ValidationError("Price change cannot be below -100%.")
+        user = validate_user(str(user))
+        return self.db.write(self._change_prices, list(item_ids), 1 + percent / 100, user)
+
+    # --- Stock movements ---
+    def _apply_movements(self, connection, movements):
+        # The delta is applied in the UPDATE itself, so concurrent receipts and
+        # picks never overwrite each other, and the guard keeps stock >= 0.
+        ledger, rejected, runs, last_run = [], [], [], {}
+        for index, (item_id, delta, reason, reference, user) in enumerate(movements):
+            cursor = connection.execute(
+                "UPDATE inventory SET quantity = quantity + ?, updated_by = ?, version = version + 1 "
+                "WHERE id = ? AND quantity + ? >= 0",
+                (delta, user, item_id, delta)
+            )
+            row = connection.execute("SELECT quantity, item_name FROM inventory WHERE id = ?", (item_id,)).fetchone()
+            if row is None:
+                rejected.append((index, ItemNotFoundError(item_id)))
+            elif cursor.rowcount == 0:
+                rejected.append((index, ValidationError(
+                    f"Moving {delta:+d} would make the quantity of item ID {item_id} negative ({row[0]} in stock).")))
+            else:
+                ledger.append((item_id, delta, row[0], reason, reference, user))
+                run = last_run.get(item_id)
+                if run is None or run[1] != user:
+                    run = last_run[item_id] = [item_id, user, row[1], row[0] - delta, None]
+                    runs.append(run)
+                run[4] = row[0]
+        connection.executemany(MOVEMENT_INSERT, ledger)
+        # One audit entry per run of an item's movements by the same user
+        # (usually one per item, however many scans the batch held), with the
+        # quantity before the first and after the last. When users take turns
+        # on an item the entries chain, so nobody is credited with another
+        # user's movements.
+        connection.executemany(AUDIT_INSERT, [
+            ("Updated", item_id, name, user, audit_changes({"quantity": before}, {"quantity": after}))
+            for item_id, user, name, before, after in runs
+        ])
+        return ledger, rejected
+
+    def record_movements(self, movements):
+        """Apply stock movements in one transaction; returns ``(applied, rejected)``.
+
+        ``movements`` are ``(item_id, delta, reason, reference, user)`` tuples.
+        Each one adds ``delta`` to the item's quantity and appends a ledger
+        row with the resulting balance. A movement that is invalid, targets a
+        deleted item or would take the quantity below zero is skipped and
+        listed in ``rejected`` as ``(index, message)``; the rest still commit.
+        ``applied`` is the number of ledger rows written.
+        """
+        valid, rejected = [], []
+        for index, movement in enumerate(movements):
+            try:
+                valid.append((index, validate_movement(*movement)))
+            except ValidationError as e:
+                rejected.append((index, str(e)))
+        if not valid:
+            return 0, rejected
+        ledger, refused = self.db.write(self._apply_movements, [movement for _, movement in valid])
+        rejected += [(valid[position][0], str(error)) for position, error in refused]
+        return len(ledger), sorted(rejected)
+
+    def move_stock(self, item_id, delta, reason, user, reference=None):
+        """Apply one stock movement; returns the new quantity.
+
+        Raises ValidationError (ItemNotFoundError for a deleted item) if the
+        movement is invalid or would take the quantity below zero.
+        """
+        movement = validate_movement(item_id, delta, reason, reference, user)
+        ledger, refused = self.db.write(self._apply_movements, [movement])
+        if refused:
+            raise refused[0][1]
+        return ledger[0][2]
+
+    def movements(self, item_id, before_id=None, limit=MOVEMENT_PAGE_SIZE):
+        """An item's ledger rows, newest first; page with ``before_id`` (the last id of the previous page).
+
+        Rows are ``(id, item_id, delta, balance, reason, reference, user, timestamp)``.
+        """
+        query, params = MOVEMENT_SELECT + " WHERE item_id = ?", [item_id]
+        if before_id is not None:
+            query += " AND id < ?"
+            params.append(before_id)
+        return self.db.query(query + " ORDER BY id DESC LIMIT ?", params + [limit])
+
+    # --- Search ---
+    def filter_clause(self, text):
+        """Return ``(where, params)`` matching items whose name contains ``text``, or ``(None, [])``."""
+        if not text:
+            return None, []
+        match = build_fts_query(text) if self.fts_enabled else ""
+        if match:
+            return "id IN (SELECT rowid FROM inventory_fts WHERE inventory_fts MATCH ?)", [match]
+        return "item_name LIKE ?", ['%' + text + '%']
+
+    def can_rank(self, text):
+        return bool(self.fts_enabled and build_fts_query(text))
+
+    def ranked_rows(self, connection, text, limit=RANKED_SEARCH_LIMIT, low_stock_only=False):
+        """Best FTS matches for ``text`` first (bm25 rank)."""
+        low_stock = " AND i.quantity < i.low_stock_threshold" if low_stock_only else ""
+        return connection.execute(f'''
+        SELECT i.id, i.item_name, i.quantity, i.price, i.updated_by, i.quantity < i.low_stock_threshold, i.version
+        FROM inventory_fts JOIN inventory i ON i.id = inventory_fts.rowid
+        WHERE inventory_fts MATCH ?{low_stock} ORDER BY rank LIMIT ?
+        ''', (build_fts_query(text), limit)).fetchall()
+
+    def count_items(self, text="", low_stock_only=False, connection=None):
+        where, params = self._view_filter(text, low_stock_only)
+        query = "SELECT COUNT(*) FROM inventory" + (f" WHERE {where}" if where else "")
+        with self._reading(connection) as connection:
+            return connection.execute(query, params).fetchone()[0]
+
+    def search(self, text="", ranked=False, limit=100, after_id=None, low_stock_only=False):
+        """Items matching ``text``, by relevance when ``ranked`` (and FTS5 is available), else by id.
+
+        Id-ordered results page with ``after_id`` (the last id of the previous page).
+        """
+        if ranked and self.can_rank(text):
+            with self.db.reader() as connection:
+                return self.ranked_rows(connection, text, min(limit, RANKED_SEARCH_LIMIT), low_stock_only)
+        where, params = self.filter_clause(text)
+        clauses = [where] if where else []
+        if low_stock_only:
+            clauses.append(LOW_STOCK_CLAUSE)
+        if after_id is not None:
+            clauses.append("id > ?")
+            params.append(after_id)
+        query = INVENTORY_SELECT
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        return self.db.query(query + " ORDER BY id LIMIT ?", params + [limit])
+
+    # --- Sorted, filtered view ---
+    # The keyset reads behind the UI's virtual scrolling. Each method takes an
+    # optional ``connection`` so a caller can make several reads on one
+    # snapshot (typically from a function run with ``db.submit_read``).
+    @contextmanager
+    def _reading(self, connection=None):
+        if connection is not None:
+            yield connection
+        else:
+            with self.db.reader() as connection:
+                yield connection
+
+    def _view_filter(self, text, low_stock_only):
+        where, params = self.filter_clause(text)
+        if low_stock_only:
+            where = f"{where} AND {LOW_STOCK_CLAUSE}" if where else LOW_STOCK_CLAUSE
+        return where, params
+
+    @staticmethod
+    def view_key_columns(sort="id"):
+        """Columns of the keyset key for ``sort``: the sort column, then id as the tie-breaker."""
+        if sort not in VIEW_SORT_COLUMNS:
+            raise ValueError(f"Cannot sort by {sort!r}.")
+        return ("id",) if sort == "id" else (sort, "id")
+
+    def page(self, sort="id", descending=False, text="", low_stock_only=False, key=None, backward=False,
+             inclusive=False, limit=100, connection=None):
+        """Up to ``limit`` items in view order, seeking past ``key`` (a ``view_key_columns`` tuple).
+
+        ``backward`` walks towards the top of the view; the rows are still
+        returned in view order. ``inclusive`` also returns the row at ``key``.
+        """
+        key_columns = self.view_key_columns(sort)
+        where, params = self._view_filter(text, low_stock_only)
+        clauses = [where] if where else []
+        ascending = backward == descending
+        if key is not None:
+            op = ('>' if ascending else '<') + ('=' if inclusive else '')
+            if len(key_columns) == 1:
+                clauses.append(f"id {op} ?")
+            else:
+                clauses.append(f"({', '.join(key_columns)}) {op} ({', '.join('?' * len(key_columns))})")
+            params.extend(key)
+        query = INVENTORY_SELECT
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        direction = "ASC" if ascending else "DESC"
+        query += " ORDER BY " + ", ".join(f"{col} {direction}" for col in key_columns) + " LIMIT ?"
+        with self._reading(connection) as connection:
+            rows = connection.execute(query, params + [limit]).fetchall()
+        return rows[::-1] if backward else rows
+
+    def anchors(self, sort="id", descending=False, text="", low_stock_only=False, step=ANCHOR_STRIDE,
+                connection=None):
+        """Every ``step``-th key of the view, so a seek can start near any position.
+
+        One index-only pass over the sort index.
+        """
+        key_columns = self.view_key_columns(sort)
+        where, params = self._view_filter(text, low_stock_only)
+        direction = "DESC" if descending else "ASC"
+        query = (f"SELECT {', '.join(key_columns)} FROM inventory" + (f" WHERE {where}" if where else "")
+                 + " ORDER BY " + ", ".join(f"{col} {direction}" for col in key_columns))
+        with self._reading(connection) as connection:
+            return list(itertools.islice(connection.execute(query, params), 0, None, step))
+
+    def view_item(self, item_id, text="", low_stock_only=False, connection=None):
+        """The item's row if it exists and matches the filter, else None."""
+        where, params = self._view_filter(text, low_stock_only)
+        query = INVENTORY_SELECT + " WHERE id = ?" + (f" AND {where}" if where else "")
+        with self._reading(connection) as connection:
+            return connection.execute(query, [item_id] + params).fetchone()
+
+    def items(self, item_ids, connection=None):
+        """Rows of the items in ``item_ids`` that still exist, in no particular order."""
+        with self._reading(connection) as connection:
+            return self._rows_for(connection, list(item_ids))
+
+    def matching_ids(self, text="", low_stock_only=False, connection=None):
+        """Ids of every item in the view, e.g. for "select all"."""
+        where, params = self._view_filter(text, low_stock_only)
+        query = "SELECT id FROM inventory" + (f" WHERE {where}" if where else "")
+        with self._reading(connection) as connection:
+            return [row[0] for row in connection.execute(query, params)]
+
+    # --- Low stock ---
+    def low_stock_ids(self, item_ids=None):
+        """Ids of items below their low-stock threshold, optionally only among ``item_ids``.
+
+        Both forms are answered from the idx_low_stock partial index.
+        """
+        if item_ids is None:
+            return [row[0] for row in self.db.query(f"SELECT id FROM inventory WHERE {LOW_STOCK_CLAUSE}")]
+        item_ids = list(item_ids)
+        low = []
+        with self.db.reader() as connection:
+            for start in range(0, len(item_ids), BATCH_CHUNK_SIZE):
+                chunk = item_ids[start:start + BATCH_CHUNK_SIZE]
+                low += [row[0] for row in connection.execute(
+                    f"SELECT id FROM inventory WHERE {LOW_STOCK_CLAUSE} AND id IN ({', '.join('?' * len(chunk))})",
+                    chunk)]
+        return low
+
+    def low_stock_items(self, limit=100):
+        """Items below their threshold, emptiest first."""
+        return self.db.query(INVENTORY_SELECT + f" WHERE {LOW_STOCK_CLAUSE} ORDER BY quantity, id LIMIT ?", (limit,))
+
+    def _set_thresholds(self, connection, item_ids, threshold, user):
+        rows = self._rows_for(connection, item_ids, "SELECT id, item_name, low_stock_threshold FROM inventory")
+        connection.executemany("UPDATE inventory SET low_stock_threshold = ?, updated_by = ?, version = version + 1 WHERE id = ?",
+                               [(threshold, user, row[0]) for row in rows])
+        self._log_updates(connection, [(row[0], row[1], audit_changes({"low_stock_threshold": row[2]},
+                                                                      {"low_stock_threshold": threshold}))
+                                       for row in rows], user)
+        return [row[0] for row in rows]
+
+    def set_low_stock_threshold(self, item_ids, threshold, user):
+        """Set the low-stock threshold of every item in one transaction; returns the updated ids."""
+        try:
+            threshold = as_integer(threshold)
+        except (TypeError, ValueError):
+            raise ValidationError("Low-stock threshold must be an integer.")
+        if threshold < 0:
+            raise ValidationError("Low-stock threshold must be non-negative.")
+        user = validate_user(str(user))
+        return self.db.write(self._set_thresholds, list(item_ids), threshold, user)
+
+    # --- Bulk ---
+    def import_rows(self, rows, batch_size=IMPORT_BATCH_SIZE, on_progress=None):
+        """Validate and insert ``(line_number, [name, quantity, price, user])`` rows; returns an ImportResult."""
+        return import_items(self.db, rows, batch_size, on_progress)
+
+    # --- Audit ---
+    def _reads_archive(self, filters):
+        date_from = filters.get("date_from")
+        return self.archived_before is not None and (not date_from or date_from < self.archived_before)
+
+    def _audit_query(self, filters=None, after=None):
+        """Return ``(query, params)`` selecting the audit rows matching ``filters``.
+
+        When the date range reaches back past the archive boundary the
+        archive is appended with UNION ALL; both halves are read in index
+        order, so sorting and limiting the union stays cheap.
+        """
+        filters = filters or {}
+        clauses, params = build_audit_filter(**filters)
+        if after is not None:
+            clauses.append("(timestamp, id) < (?, ?)")
+            params.extend(after)
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+        if not self._reads_archive(filters):
+            return AUDIT_SELECT + where, params
+        return f"{AUDIT_SELECT}{where} UNION ALL {ARCHIVE_SELECT}{where}", params + params
+
+    def audit_page(self, filters=None, after=None, limit=AUDIT_PAGE_SIZE):
+        """Newest-first page of audit rows, seeking past the ``(timestamp, id)`` key ``after``.
+
+        ``filters`` takes the keyword arguments of ``build_audit_filter``.
+        """
+        query, params = self._audit_query(filters, after)
+        return self.db.query(query + " ORDER BY timestamp DESC, id DESC LIMIT ?", params + [limit])
+
+    # --- Audit retention ---
+    def retention_due(self, interval_hours=ARCHIVE_INTERVAL_HOURS):
+        """True when the audit log has not been archived in the last ``interval_hours``."""
+        if "archive" not in self.db.attach:
+            return False
+        return self.db.query_one(
+            "SELECT NOT EXISTS (SELECT 1 FROM audit_retention WHERE last_run >= datetime('now', ?))",
+            (f"-{interval_hours} hours",))[0] == 1
+
+    def _copy_archive_batch(self, connection, cutoff, batch_size):
+        ids = [(row[0],) for row in connection.execute(
+            "SELECT id FROM audit_log WHERE timestamp < ? ORDER BY timestamp LIMIT ?", (cutoff, batch_size))]
+        connection.executemany("INSERT OR IGNORE INTO archive.audit_archive " + AUDIT_SELECT + " WHERE id = ?", ids)
+        return ids
+
+    def _delete_archived(self, connection, ids):
+        connection.executemany(
+            "DELETE FROM audit_log WHERE id = ? AND EXISTS (SELECT 1 FROM archive.audit_archive WHERE id = ?)",
+            [(item_id, item_id) for item_id, in ids])
+
+    def _record_archive_run(self, connection, cutoff, moved):
+        connection.execute('''
+        INSERT INTO audit_retention (id, archived_before, archived_rows, last_run)
+        VALUES (1, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT (id) DO UPDATE SET archived_before = max(IFNULL(archived_before, ''), excluded.archived_before),
+            archived_rows = archived_rows + excluded.archived_rows, last_run = excluded.last_run
+        ''', (cutoff, moved))
+        return connection.execute("SELECT archived_before FROM audit_retention").fetchone()[0]
+
+    def archive_audit(self, retention_days=AUDIT_RETENTION_DAYS, batch_size=ARCHIVE_BATCH_SIZE, on_progress=None):
+        """Move audit rows older than ``retention_days`` into the archive, then compact the file.
+
+        Rows move ``batch_size`` at a time, so UI writes are never held up
+        for long. Each batch is copied and committed to the archive first and
+        only then deleted from the audit log, in a second transaction that
+        deletes just the rows the archive holds: SQLite commits the two WAL
+        files separately, so one transaction doing both could lose rows if
+        the process died between the two commits.
+        ``on_progress(moved)`` is called after every batch. Returns the number
+        of rows moved.
+        """
+        if "archive" not in self.db.attach:
+            raise sqlite3.ProgrammingError("No archive database is attached.")
+        cutoff = self.db.query_one("SELECT datetime('now', ?)", (f"-{int(retention_days)} days",))[0]
+        self.db.write(create_archive_schema)
+        moved = 0
+        while True:
+            ids = self.db.write(self._copy_archive_batch, cutoff, batch_size)
+            self.db.write(self._delete_archived, ids)
+            count = len(ids)
+            moved += count
+            if on_progress is not None and count:
+                on_progress(moved)
+            if count < batch_size:
+                break
+        self.archived_before = self.db.write(self._record_archive_run, cutoff, moved)
+        if moved:
+            self.compact()
+        return moved
+
+    def compact(self):
+        """Return free pages to the file system with incremental VACUUM.
+
+        A database created before incremental auto-vacuum was enabled is
+        converted by one full VACUUM; after that, free pages are released a
+        step at a time.
+        """
+        def enable_incremental(connection):
+            connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            connection.execute("VACUUM main")
+
+        def release(connection, pages):
+            connection.execute(f"PRAGMA incremental_vacuum({pages})").fetchall()
+            return connection.execute("PRAGMA freelist_count").fetchone()[0]
+
+        # 2 = INCREMENTAL. Asked on the writer: pooled readers may report the mode cached before a VACUUM.
+        if self.db.maintain(lambda connection: connection.execute("PRAGMA auto_vacuum").fetchone()[0]) != 2:
+            self.db.maintain(enable_incremental)
+        else:
+            while self.db.maintain(release, VACUUM_STEP_PAGES):
+                pass
+        self.db.maintain(lambda connection: connection.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall())
+
+    # --- Dashboard ---
+    def dashboard(self, days=DASHBOARD_DAYS):
+        """Stock totals and per-user activity for the last ``days`` days (UTC, newest first).
+
+        Reads only the trigger-maintained summary tables, so the cost does not
+        grow with ``inventory`` or ``audit_log``. Activity rows are
+        ``(day, user, added, updated, deleted, total)``.
+        """
+        with self.db.reader() as connection:
+            totals = connection.execute(
+                "SELECT item_count, total_quantity, value_cents, low_stock_count FROM inventory_totals"
+            ).fetchone() or (0, 0, 0, 0)
+            activity = connection.execute('''
+            SELECT day, user,
+                   SUM(CASE WHEN action = 'Added' THEN edits ELSE 0 END),
+                   SUM(CASE WHEN action = 'Updated' THEN edits ELSE 0 END),
+                   SUM(CASE WHEN action = 'Deleted' THEN edits ELSE 0 END),
+                   SUM(edits)
+            FROM audit_daily WHERE day >= date('now', ?)
+            GROUP BY day, user HAVING SUM(edits) > 0 ORDER BY day DESC, user
+            ''', (f"-{days - 1} days",)).fetchall()
+        items, quantity, value_cents, low_stock = totals
+        return {"items": items, "quantity": quantity, "value": value_cents / 100,
+                "low_stock": low_stock, "activity": activity}
+
+    def rebuild_summaries(self):
+        """Recompute the dashboard summaries from scratch (after editing the database by hand)."""
+        self.db.write(rebuild_summaries)
+
+    # --- Snapshots ---
+    def snapshot_due(self, interval_hours=SNAPSHOT_INTERVAL_HOURS):
+        """True when no inventory snapshot was taken in the last ``interval_hours``."""
+        return self.db.query_one(
+            "SELECT NOT EXISTS (SELECT 1 FROM inventory_snapshots WHERE taken_at >= datetime('now', ?))",
+            (f"-{interval_hours} hours",))[0] == 1
+
+    def _take_snapshot(self, connection, full):
+        last = connection.execute("SELECT id, full_id, audit_id FROM inventory_snapshots ORDER BY id DESC LIMIT 1").fetchone()
+        # The audit sequence, not MAX(id): archiving may have emptied audit_log.
+        audit_id = connection.execute(
+            "SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'audit_log'), 0)").fetchone()[0]
+        full_id = None
+        if last is not None and not full:
+            full_id = last[1] or last[0]
+            chain = connection.execute("SELECT COUNT(*) FROM inventory_snapshots WHERE id >= ?", (full_id,)).fetchone()[0]
+            if chain >= SNAPSHOT_FULL_EVERY:
+                full_id = None  # Start a new chain so reconstruction never reads more than SNAPSHOT_FULL_EVERY.
+        snapshot_id = connection.execute(
+            "INSERT INTO inventory_snapshots (taken_at, full_id, audit_id, items) VALUES (CURRENT_TIMESTAMP, ?, ?, 0)",
+            (full_id, audit_id)
+        ).lastrowid
+        if full_id is None:
+            items = connection.execute(
+                "INSERT INTO snapshot_items (snapshot_id, item_id, item_name, quantity, price) "
+                "SELECT ?, id, item_name, quantity, price FROM inventory",
+                (snapshot_id,)
+            ).rowcount
+        else:
+            # Every write to an item is audited in its own transaction, so the
+            # audit entries since the last snapshot name every changed item.
+            items = connection.execute('''
+            INSERT INTO snapshot_items (snapshot_id, item_id, item_name, quantity, price)
+            SELECT ?, changed.item_id, i.item_name, i.quantity, i.price
+            FROM (SELECT DISTINCT item_id FROM audit_log WHERE id > ? AND item_id IS NOT NULL) AS changed
+            LEFT JOIN inventory i ON i.id = changed.item_id
+            ''', (snapshot_id, last[2])).rowcount
+        connection.execute("UPDATE inventory_snapshots SET items = ? WHERE id = ?", (items, snapshot_id))
+        return snapshot_id, full_id is None, items
+
+    def take_snapshot(self, full=False):
+        """Record the current inventory; returns ``(snapshot_id, full, items_stored)``.
+
+        Every ``SNAPSHOT_FULL_EVERY``-th snapshot (and the first) copies the
+        whole table; the others store only the items changed since the
+        previous snapshot.
+        """
+        return self.db.write(self._take_snapshot, full)
+
+    def snapshots(self):
+        """``(id, taken_at, full, items)`` for every snapshot, newest first."""
+        return self.db.query("SELECT id, taken_at, full_id IS NULL, items FROM inventory_snapshots ORDER BY id DESC")
+
+    def _chain_rows(self, connection, chain, item_ids):
+        """``{item_id: (item_name, quantity, price)}`` as of the last snapshot in ``chain``, for ``item_ids``."""
+        found = {}
+        for snapshot_id in reversed(chain):
+            remaining = [item_id for item_id in item_ids if item_id not in found]
+            for start in range(0, len(remaining), BATCH_CHUNK_SIZE):
+                chunk = remaining[start:start + BATCH_CHUNK_SIZE]
+                for item_id, name, quantity, price in connection.execute(
+                        "SELECT item_id, item_name, quantity, price FROM snapshot_items "
+                        f"WHERE snapshot_id = ? AND item_id IN ({', '.join('?' * len(chunk))})",
+                        [snapshot_id] + chunk):
+                    found[item_id] = None if name is None else (name, quantity, price)
+        return {item_id: row for item_id, row in found.items() if row is not None}
+
+    def _chain_items(self, connection, chain, after_id=None):
+        """Yield ``(item_id, item_name, quantity, price)`` as of the last snapshot in ``chain``, by id.
+
+        Each snapshot is read in key order from ``after_id`` on and the
+        streams are merged, the latest snapshot winning; items deleted along
+        the chain come through with a None name.
+        """
+        streams = [connection.execute(
+            "SELECT item_id, ?, item_name, quantity, price FROM snapshot_items "
+            "WHERE snapshot_id = ? AND item_id > ? ORDER BY item_id",
+            (-position, snapshot_id, -1 if after_id is None else after_id))
+            for position, snapshot_id in enumerate(chain)]
+        last = None
+        for item_id, _, name, quantity, price in heapq.merge(*streams):
+            if item_id != last:
+                last = item_id
+                yield item_id, name, quantity, price
+
+    def _as_of_plan(self, connection, cutoff):
+        """Return ``(chain, tables, bounds)`` for the inventory just before ``cutoff``.
+
+        ``chain`` lists the snapshot ids to read (a full snapshot and its
+        deltas); the audit entries to replay are those in ``tables`` written
+        after the last of them and before ``cutoff``, with ``bounds`` holding
+        ``(after audit id, cutoff, last audit id or None)``.
+        """
+        snapshot = connection.execute(
+            "SELECT id, full_id, audit_id, taken_at FROM inventory_snapshots WHERE taken_at < ? "
+            "ORDER BY taken_at DESC, id DESC LIMIT 1", (cutoff,)).fetchone()
+        if snapshot is None:
+            first = connection.execute("SELECT MIN(taken_at) FROM inventory_snapshots").fetchone()[0]
+            raise ValidationError("No inventory snapshot has been taken yet." if first is None
+                                  else f"History starts at the first inventory snapshot ({first}).")
+        snapshot_id, full_id, audit_id, taken_at = snapshot
+        chain = [row[0] for row in connection.execute(
+            "SELECT id FROM inventory_snapshots WHERE id BETWEEN ? AND ? ORDER BY id", (full_id or snapshot_id, snapshot_id))]
+
+        # Replay the audit diffs written after the snapshot, up to the next
+        # snapshot at most, so the work is bounded by one snapshot interval.
+        following = connection.execute("SELECT audit_id FROM inventory_snapshots WHERE id > ? ORDER BY id LIMIT 1",
+                                       (snapshot_id,)).fetchone()
+        tables = ["audit_log"]
+        if "archive" in self.db.attach and self.archived_before and taken_at < self.archived_before:
+            tables.append("archive.audit_archive")
+        return chain, tables, (audit_id, cutoff, following[0] if following else None)
+
+    def _replay_query(self, plan, condition="", low=None, high=None):
+        # Only the entries of items in the key range (low, high] are read.
+        # For a range, "+id" keeps SQLite on the item_id index (which holds
+        # the rowid, so older entries are skipped without a table lookup)
+        # instead of scanning every entry of the interval by rowid.
+        _, tables, (audit_id, cutoff, following) = plan
+        column = "id" if low is None and high is None else "+id"
+        where = f"WHERE {column} > ? AND timestamp < ?" + (f" AND {column} <= ?" if following else "")
+        params = [audit_id, cutoff] + ([following] if following else [])
+        if low is not None:
+            condition += " AND item_id > ?"
+            params = params + [low]
+        if high is not None:
+            condition += " AND item_id <= ?"
+            params = params + [high]
+        return (" UNION ALL ".join(f"SELECT id, action, item_id, changes FROM {table} {where}{condition}"
+                                   for table in tables) + " ORDER BY id", params * len(tables))
+
+    def _replay(self, connection, plan, base, low, high):
+        """Rows of the items in (``low``, ``high``] changed after the snapshot: ``{item_id: row or None}``."""
+        query, params = self._replay_query(plan, "", low, high)
+        replayed = {}
+        for _, action, item_id, changes in connection.execute(query, params):
+            if item_id is None:
+                continue
+            if action == "Deleted":
+                replayed[item_id] = None
+                continue
+            fields = {field: new for field, (old, new) in json.loads(changes).items()
+                      if field in SNAPSHOT_FIELDS} if changes else {}
+            if not fields:
+                continue
+            row = dict(zip(SNAPSHOT_FIELDS, replayed.get(item_id, base.get(item_id)) or ()))
+            if action != "Added" and not row:
+                continue  # An update to an item the snapshot does not know.
+            row.update(fields)
+            replayed[item_id] = tuple(row.get(field) for field in SNAPSHOT_FIELDS)
+        return replayed
+
+    def _as_of_rows(self, connection, plan, after_id=None, window=REPORT_BATCH_SIZE):
+        """Yield ``(id, item_name, quantity, price)`` as of the plan's cutoff, in id order.
+
+        The key space is worked through ``window`` snapshot rows at a time,
+        replaying only the audit entries of the items in each key range, so
+        a page costs its own range rather than the whole interval.
+        """
+        items = self._chain_items(connection, plan[0], after_id)
+        low = after_id
+        while True:
+            rows = list(itertools.islice(items, window))
+            high = rows[-1][0] if len(rows) == window else None
+            base = {item_id: (name, quantity, price) for item_id, name, quantity, price in rows if name is not None}
+            current = dict(base)
+            current.update(self._replay(connection, plan, base, low, high))
+            for item_id in sorted(current):
+                if current[item_id] is not None:
+                    yield (item_id,) + current[item_id]
+            if high is None:
+                return
+            low = high
+
+    def _count_as_of(self, connection, plan):
+        chain = plan[0]
+        count = connection.execute(
+            "SELECT COUNT(*) FROM (SELECT MAX(snapshot_id), item_name FROM snapshot_items "
+            "WHERE snapshot_id BETWEEN ? AND ? GROUP BY item_id) WHERE item_name IS NOT NULL",
+            (chain[0], chain[-1])).fetchone()[0]
+        # Only additions and deletions change the count.
+        query, params = self._replay_query(plan, " AND action IN ('Added', 'Deleted')")
+        exists = {item_id: action == "Added" for _, action, item_id, _ in connection.execute(query, params)
+                  if item_id is not None}
+        base = self._chain_rows(connection, chain, list(exists))
+        return count + sum(present - (item_id in base) for item_id, present in exists.items())
+
+    def inventory_as_of(self, as_of, after_id=None, limit=100):
+        """Items as they were at ``as_of`` (YYYY-MM-DD for the end of that day), by id.
+
+        Rows are ``(id, item_name, quantity, price)``; page with ``after_id``.
+        A page reads the snapshot rows and audit entries of its own key
+        range, so the cost depends on the page size and on the changes made
+        in one snapshot interval, not on how far back ``as_of`` is.
+        """
+        cutoff = as_of_cutoff(as_of)
+        with self.db.reader() as connection:
+            plan = self._as_of_plan(connection, cutoff)
+            return list(itertools.islice(self._as_of_rows(connection, plan, after_id, max(limit, 1)), limit))
+
+    # --- Reports ---
+    def export_report(self, path, on_progress=None, audit_filters=None, as_of=None):
+        """Write the inventory and audit log to an .xlsx file at ``path``.
+
+        Rows are streamed from one read connection into a write-only workbook,
+        so memory stays flat however large the audit log grows.
+        ``audit_filters`` (as for ``audit_page``) limits the audit sheet; the
+        archive is included when the range reaches into it. With ``as_of``
+        the inventory sheet shows the items as they were then, rebuilt from
+        the snapshots (see ``inventory_as_of``).
+        ``on_progress(sheet, written, total)`` is called after every batch.
+        """
+        import openpyxl  # Imported on first use to keep it off the startup path.
+
+        cutoff = as_of_cutoff(as_of) if as_of else None
+        with self.db.reader() as connection:
+            wb = openpyxl.Workbook(write_only=True)
+            cursor = connection.cursor()
+
+            if cutoff is None:
+                cursor.execute("SELECT COUNT(*) FROM inventory")
+                total = cursor.fetchone()[0]
+                cursor.execute("SELECT id, item_name, quantity, price, updated_by FROM inventory ORDER BY id")
+                write_report_sheet(wb, "Inventory", ['ID', 'Item Name', 'Quantity', 'Price', 'Updated By'],
+                                   [5, 30, 10, 12, 20], cursor, total, on_progress)
+            else:
+                plan = self._as_of_plan(connection, cutoff)
+                write_report_sheet(wb, "Inventory", ['ID', 'Item Name', 'Quantity', 'Price'], [5, 30, 10, 12],
+                                   self._as_of_rows(connection, plan), self._count_as_of(connection, plan), on_progress)
+
+            query, params = self._audit_query(audit_filters)
+            cursor.execute(f"SELECT COUNT(*) FROM ({query})", params)
+            total = cursor.fetchone()[0]
+            cursor.execute(query + " ORDER BY timestamp DESC, id DESC", params)
+            write_report_sheet(wb, "Audit Log", ['ID', 'Action', 'Item ID', 'Item Name', 'User', 'Timestamp', 'Changes'],
+                               [5, 12, 8, 30, 20, 22, 50], cursor, total, on_progress)
+            wb.save(path)
+
+
+class MovementFeed:
+    """Group-commits stock movements from a fast source such as a barcode scanner feed.
+
+    ``add`` only queues a movement. A background thread takes everything
+    queued so far (up to ``batch_size``) and applies it with one
+    ``record_movements`` call: at low rates each scan commits on its own right
+    away, and under load every commit carries the scans that arrived while the
+    previous one was being written. Rejected movements are passed to
+    ``on_rejected(movement, message)`` on the feed thread, or logged as
+    warnings when no callback is given. A batch that fails as a whole (for
+    example because the database was closed) counts as rejected; the feed
+    keeps running either way.
+    """
+
+    def __init__(self, store, batch_size=MOVEMENT_BATCH_SIZE, on_rejected=None):
+        self.store = store
+        self.batch_size = batch_size
+        self.on_rejected = on_rejected
+        self.applied = 0
+        self.rejected = 0
+        self.commits = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="movement-feed", daemon=True)
+        self._thread.start()
+
+    def _put(self, entry):
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("The movement feed is closed.")
+            self._queue.put(entry)
+
+    def add(self, item_id, delta, reason, user, reference=None):
+        self._put((item_id, delta, reason, reference, user))
+
+    def flush(self):
+        """Block until every movement added so far is committed (or rejected)."""
+        done = threading.Event()
+        self._put(done)
+        done.wait()
+
+    def close(self):
+        """Commit what is queued and stop the feed thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        running = True
+        while running:
+            batch, waiters = [], []
+            entry = self._queue.get()
+            while True:
+                if entry is None:
+                    running = False
+                elif isinstance(entry, threading.Event):
+                    waiters.append(entry)
+                else:
+                    batch.append(entry)
+                if not running or len(batch) >= self.batch_size:
+                    break
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            try:
+                if batch:
+                    self._commit(batch)
+            finally:
+                for waiter in waiters:
+                    waiter.set()
+
+    def _commit(self, batch):
+        try:
+            applied, rejected = self.store.record_movements(batch)
+            self.commits += 1
+        except sqlite3.Error as e:
+            applied, rejected = 0, [(index, f"Database error: {e}") for index in range(len(batch))]
+        except Exception as e:
+            applied, rejected = 0, [(index, f"Failed to record movements: {e!r}") for index in range(len(batch))]
+        self.applied += applied
+        self.rejected += len(rejected)
+        for index, message in rejected:
+            if self.on_rejected is None:
+                log.warning("Rejected stock movement %s: %s", batch[index], message)
+                continue
+            try:
+                self.on_rejected(batch[index], message)
+            except Exception:
+                log.exception("on_rejected failed for stock movement %s", batch[index])